@@ -0,0 +1,183 @@
+"""Disk-backed cache of Flickr API responses."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+# orjson, when installed, speeds up storing and loading large pages
+_HAS_ORJSON = False
+try:
+    import orjson
+    _HAS_ORJSON = True
+except ImportError:
+    pass
+
+CACHE_NAME = "api_cache.sqlite"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_HOUR = 3600
+_DAY = 24 * _HOUR
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key      TEXT PRIMARY KEY,
+    method   TEXT NOT NULL,
+    body     TEXT NOT NULL,
+    bytes    INTEGER NOT NULL,
+    expires  REAL NOT NULL,
+    accessed REAL NOT NULL
+)
+"""
+
+
+def _interestingness_ttl(kwargs):
+    """A day's Explore list is final once the day is well in the past."""
+    try:
+        day = date.fromisoformat(str(kwargs.get("date", "")))
+    except ValueError:
+        return _HOUR
+    if day < date.today() - timedelta(days=2):
+        return 30 * _DAY
+    return _HOUR
+
+
+# Seconds each API method's responses stay fresh. A callable receives the
+# call's arguments. Methods not listed here are never cached.
+DEFAULT_TTLS = {
+    "flickr.interestingness.getList": _interestingness_ttl,
+    "flickr.photos.search": _HOUR,
+    "flickr.people.getPublicPhotos": 15 * 60,
+    "flickr.photosets.getList": _HOUR,
+    "flickr.photosets.getPhotos": 15 * 60,
+    "flickr.people.findByUsername": 7 * _DAY,
+    "flickr.urls.lookupUser": 7 * _DAY,
+    "flickr.photos.getSizes": 7 * _DAY,
+}
+
+
+class ApiCache:
+    """Caches parsed Flickr API responses in an SQLite file.
+
+    Entries are keyed by method name and the call's arguments (normalised
+    so argument order and int/str spelling do not matter) and expire after
+    the method's TTL. When the stored responses exceed ``max_bytes`` the
+    least recently used ones are evicted. One instance is safe to share
+    between threads, FlickrDownloader objects and concurrent jobs.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, ttls=None):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_NAME)
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def ttl(self, method, kwargs):
+        """Seconds a response stays fresh, 0 if the method is not cached."""
+        ttl = self.ttls.get(method, 0)
+        return ttl(kwargs) if callable(ttl) else ttl
+
+    def get(self, method, kwargs):
+        """Return the cached response for a call, or None."""
+        if not self.ttl(method, kwargs):
+            return None
+        key = _cache_key(method, kwargs)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body FROM responses WHERE key = ? AND expires > ?",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return orjson.loads(row[0]) if _HAS_ORJSON else json.loads(row[0])
+
+    def put(self, method, kwargs, response):
+        """Store a response if its method is cacheable."""
+        ttl = self.ttl(method, kwargs)
+        if not ttl:
+            return
+        if _HAS_ORJSON:
+            body = orjson.dumps(response).decode("utf-8")
+        else:
+            body = json.dumps(response, separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, method, body, bytes, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (_cache_key(method, kwargs), method, body, len(body),
+                 now + ttl, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(bytes), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, bytes FROM responses ORDER BY accessed").fetchall()
+        doomed = []
+        for key, nbytes in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= nbytes
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache.
+
+        Returns:
+            Dict with 'hits', 'misses', 'evictions', 'entries' and 'bytes'.
+        """
+        with self._lock:
+            entries, nbytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM responses"
+            ).fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": nbytes,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _cache_key(method, kwargs):
+    """Hash of the method and its arguments, ignoring order and empties."""
+    params = {k: str(v) for k, v in kwargs.items()
+              if v is not None and v != ""}
+    raw = json.dumps([method, sorted(params.items())])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
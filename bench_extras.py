@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Compare list responses requested with all extras against minimal extras.
+
+"full" is the constant every fetch method used to send; "minimal" is what
+FlickrDownloader.limit_extras() asks for with the given download options.
+By default a 500-photo page is generated in the shape Flickr returns so the
+numbers are repeatable offline; --live fetches real Explore pages instead
+(FLICKR_API_KEY from the environment or .env).
+
+Usage:
+    python bench_extras.py [--size url_l] [--metadata true|stream|sidecar|false]
+                           [--template "{title}_{id}"] [--live DATE]
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+import tracemalloc
+
+from dotenv import load_dotenv
+
+import flickr_downloader as core
+import http_pool
+
+_REST_URL = "https://api.flickr.com/services/rest/"
+
+_SIZES = {
+    "url_sq": 75, "url_t": 100, "url_s": 240, "url_n": 320, "url_m": 500,
+    "url_z": 640, "url_c": 800, "url_l": 1024, "url_h": 1600, "url_o": 4000,
+}
+_FIELDS = {
+    "description": lambda r: {"_content": " ".join(
+        r.choice(("golden", "hour", "over", "the", "harbour", "north", "pier",
+                  "at", "dusk", "<a href=\"https://example.com\">link</a>"))
+        for _ in range(r.randint(0, 60)))},
+    "tags": lambda r: " ".join(f"tag{r.randint(1, 5000)}"
+                               for _ in range(r.randint(0, 25))),
+    "owner_name": lambda r: f"Photographer {r.randint(1, 99999)}",
+    "date_taken": lambda r: "2024-05-01 18:30:00",
+    "license": lambda r: str(r.randint(0, 10)),
+    "date_upload": lambda r: str(1714000000 + r.randint(0, 999999)),
+    "last_update": lambda r: str(1714000000 + r.randint(0, 999999)),
+}
+# Keys Flickr uses in the response for each extra
+_KEYS = {"owner_name": "ownername", "date_taken": "datetaken",
+         "date_upload": "dateupload", "last_update": "lastupdate"}
+
+
+def _synthetic_page(extras, per_page=500, seed=1):
+    """Return a photos response body as Flickr would send it."""
+    rnd = random.Random(seed)
+    wanted = extras.split(",")
+    photos = []
+    for n in range(per_page):
+        photo = {"id": str(53000000000 + n), "owner": "12345678@N00",
+                 "secret": "a1b2c3d4e5", "server": "65535", "farm": 66,
+                 "title": f"Photo number {n}", "ispublic": 1, "isfriend": 0,
+                 "isfamily": 0}
+        # Draw every field so both variants carry identical values
+        values = {name: make(rnd) for name, make in _FIELDS.items()}
+        for key, width in _SIZES.items():
+            if key in wanted:
+                suffix = key[4:]
+                photo[key] = (f"https://live.staticflickr.com/65535/"
+                              f"{photo['id']}_a1b2c3d4e5_{suffix}.jpg")
+                photo[f"height_{suffix}"] = width * 3 // 4
+                photo[f"width_{suffix}"] = width
+        for name in wanted:
+            if name in values:
+                photo[_KEYS.get(name, name)] = values[name]
+        photos.append(photo)
+    body = {"photos": {"page": 1, "pages": 1, "perpage": per_page,
+                       "total": per_page, "photo": photos}, "stat": "ok"}
+    return json.dumps(body).encode("utf-8")
+
+
+def _live_page(api_key, extras, day):
+    """Fetch one Explore page and return the raw response body."""
+    resp = http_pool.get(_REST_URL, timeout=30, params={
+        "method": "flickr.interestingness.getList", "api_key": api_key,
+        "date": day, "extras": extras, "per_page": 500, "page": 1,
+        "format": "json", "nojsoncallback": 1,
+    })
+    resp.raise_for_status()
+    return resp.content
+
+
+def _measure(body, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        json.loads(body)
+    parse = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    parsed = json.loads(body)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del parsed
+    return {"bytes": len(body), "parse": parse, "memory": retained}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", default="url_l",
+                        choices=list(core.PHOTO_SIZES.values()))
+    parser.add_argument("--metadata", default="true",
+                        choices=("true", "stream", "sidecar", "false"))
+    parser.add_argument("--template", default="{title}_{id}")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--live", metavar="DATE",
+                        help="fetch Explore for DATE (YYYY-MM-DD) instead")
+    args = parser.parse_args()
+
+    embed = {"true": True, "false": False}.get(args.metadata, args.metadata)
+    variants = {
+        "full": core._EXTRAS,
+        "minimal": core.photo_extras(args.size, embed, args.template),
+    }
+    if args.live:
+        load_dotenv()
+        api_key = os.environ.get("FLICKR_API_KEY", "")
+        if not api_key:
+            parser.error("--live needs FLICKR_API_KEY")
+        bodies = {name: _live_page(api_key, extras, args.live)
+                  for name, extras in variants.items()}
+    else:
+        bodies = {name: _synthetic_page(extras)
+                  for name, extras in variants.items()}
+
+    results = {name: _measure(body, args.repeat)
+               for name, body in bodies.items()}
+    print(f"minimal extras: {variants['minimal']}")
+    print(f"{'extras':<8} {'response':>10} {'parse ms':>9} {'in memory':>10}")
+    for name, r in results.items():
+        print(f"{name:<8} {r['bytes'] / 1024:>9.0f}K {r['parse'] * 1000:>9.2f} "
+              f"{r['memory'] / 1024:>9.0f}K")
+    full, minimal = results["full"], results["minimal"]
+    print(f"minimal is {minimal['bytes'] / full['bytes']:.0%} of the bytes, "
+          f"{minimal['parse'] / full['parse']:.0%} of the parse time and "
+          f"{minimal['memory'] / full['memory']:.0%} of the memory")
+
+
+if __name__ == "__main__":
+    main()
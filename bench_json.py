@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Compare decoding and projecting 500-photo API pages.
+
+Each recorded page is decoded with the stdlib json module and, when it is
+installed, orjson, and either kept as parsed dicts (what flickrapi's
+parsed-json format gives) or projected onto Photo records as the fetch
+methods do. Pages can be recorded from Flickr with --record, or given as
+files; without either a synthetic page is used.
+
+Usage:
+    python bench_json.py [PAGE.json ...]
+    python bench_json.py --record 2024-05-01 [--pages 3] [--out pages/]
+"""
+
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+from dotenv import load_dotenv
+
+import bench_extras
+import flickr_client
+import flickr_downloader as core
+import http_pool
+
+_HAS_ORJSON = flickr_client._HAS_ORJSON
+if _HAS_ORJSON:
+    import orjson
+
+
+def _record(day, pages, out_dir):
+    """Save raw Explore pages for DATE; return their paths."""
+    load_dotenv()
+    api_key = os.environ.get("FLICKR_API_KEY", "")
+    if not api_key:
+        raise SystemExit("--record needs FLICKR_API_KEY")
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for page in range(1, pages + 1):
+        resp = http_pool.get(bench_extras._REST_URL, timeout=30, params={
+            "method": "flickr.interestingness.getList", "api_key": api_key,
+            "date": day, "extras": core._EXTRAS, "per_page": 500,
+            "page": page, "format": "json", "nojsoncallback": 1,
+        })
+        resp.raise_for_status()
+        path = os.path.join(out_dir, f"interestingness_{day}_{page}.json")
+        with open(path, "wb") as f:
+            f.write(resp.content)
+        paths.append(path)
+    return paths
+
+
+def _decoders():
+    decoders = {"json": json.loads}
+    if _HAS_ORJSON:
+        decoders["orjson"] = orjson.loads
+    return decoders
+
+
+def _project(parsed):
+    return [core.Photo.from_api(entry) for entry in parsed["photos"]["photo"]]
+
+
+def _measure(body, decode, project, repeat):
+    def run():
+        parsed = decode(body)
+        return project(parsed) if project else parsed
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    kept = run()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return elapsed, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="recorded page files")
+    parser.add_argument("--record", metavar="DATE",
+                        help="record Explore pages for DATE first")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--out", default="recorded_pages")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    files = list(args.files)
+    if args.record:
+        files += _record(args.record, args.pages, args.out)
+    if files:
+        bodies = []
+        for path in files:
+            with open(path, "rb") as f:
+                bodies.append(f.read())
+    else:
+        bodies = [bench_extras._synthetic_page(core._EXTRAS)]
+
+    print(f"{len(bodies)} page(s), {sum(map(len, bodies)) / len(bodies) / 1024:.0f}K "
+          f"each on average")
+    print(f"{'decoder':<8} {'result':<7} {'ms/page':>8} {'retained':>9}")
+    baseline = None
+    for name, decode in _decoders().items():
+        for kind, project in (("dicts", None), ("Photos", _project)):
+            times, sizes = zip(*(_measure(body, decode, project, args.repeat)
+                                 for body in bodies))
+            ms = sum(times) / len(times) * 1000
+            kb = sum(sizes) / len(sizes) / 1024
+            if baseline is None:
+                baseline = ms, kb
+            print(f"{name:<8} {kind:<7} {ms:>8.2f} {kb:>8.0f}K  "
+                  f"({ms / baseline[0]:.0%} time, {kb / baseline[1]:.0%} memory)")
+
+
+if __name__ == "__main__":
+    main()
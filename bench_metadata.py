@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Compare disk I/O of the two metadata embedding paths.
+
+"rewrite" writes the download to disk and then embeds metadata with
+pyexiv2/piexif (embed_metadata=True). "stream" splices the metadata in as
+the bytes are written (embed_metadata="stream"). Both run against JPEGs
+held in memory, so only local I/O is measured.
+
+Usage:
+    python bench_metadata.py [--photos 20] [--megapixels 12] [FILE.jpg ...]
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+
+import flickr_downloader as core
+
+_FIELDS = ("Sunset over the harbour", "Taken from the north pier at dusk.",
+           ["sunset", "harbour", "boats"], "Example Owner")
+
+
+def _io_counters():
+    """Return (bytes read, bytes written) by this process so far, or None."""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+    except OSError:
+        return None
+    return int(fields["rchar"]), int(fields["wchar"])
+
+
+def _sample_jpeg(megapixels):
+    from PIL import Image
+    side = int((megapixels * 1_000_000) ** 0.5)
+    img = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def _save(data, filepath, metadata):
+    """Write data to filepath the way _fetch_to_file does."""
+    part = filepath + core.PART_SUFFIX
+    hasher = core._PartHasher(part)
+    headers = {"ETag": '"bench"'}
+    with core._PartWriter(part, "bench://", headers, len(data), 0, {},
+                          hasher, metadata) as out:
+        for pos in range(0, len(data), 65536):
+            out.write(data[pos:pos + 65536])
+    if not out.spliced:
+        core._write_metadata(part, *_FIELDS)
+    core._commit_part(part, filepath)
+
+
+def _run(mode, samples, photos, workdir):
+    metadata = _FIELDS if mode == "stream" else None
+    before = _io_counters()
+    start = time.perf_counter()
+    for n in range(photos):
+        data = samples[n % len(samples)]
+        _save(data, os.path.join(workdir, f"{mode}_{n}.jpg"), metadata)
+    elapsed = time.perf_counter() - start
+    after = _io_counters()
+    payload = sum(len(samples[n % len(samples)]) for n in range(photos))
+    return {
+        "seconds": elapsed,
+        "payload": payload / photos,
+        "read": (after[0] - before[0]) / photos if before else None,
+        "written": (after[1] - before[1]) / photos if before else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="JPEG files to use")
+    parser.add_argument("--photos", type=int, default=20)
+    parser.add_argument("--megapixels", type=float, default=12)
+    args = parser.parse_args()
+
+    if not (core._HAS_PYEXIV2 or core._HAS_PIEXIF):
+        parser.error("pyexiv2 or piexif is needed for the rewrite path")
+    if args.files:
+        samples = []
+        for path in args.files:
+            with open(path, "rb") as f:
+                samples.append(f.read())
+    else:
+        samples = [_sample_jpeg(args.megapixels)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {mode: _run(mode, samples, args.photos, workdir)
+                   for mode in ("rewrite", "stream")}
+
+    print(f"{'mode':<8} {'served':>10} {'written':>10} {'read':>10} "
+          f"{'ms/photo':>9}")
+    for mode, r in results.items():
+        written = f"{r['written'] / 1024:.0f}K" if r["written"] is not None else "n/a"
+        read = f"{r['read'] / 1024:.0f}K" if r["read"] is not None else "n/a"
+        print(f"{mode:<8} {r['payload'] / 1024:>9.0f}K {written:>10} "
+              f"{read:>10} {r['seconds'] * 1000 / args.photos:>9.1f}")
+    if results["stream"]["written"]:
+        ratio = results["rewrite"]["written"] / results["stream"]["written"]
+        print(f"rewrite writes {ratio:.2f}x the bytes of stream per photo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Per-directory SQLite manifest of downloaded photos."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+MANIFEST_NAME = ".flickr_manifest.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    photo_id   TEXT NOT NULL,
+    size_key   TEXT NOT NULL,
+    url        TEXT,
+    path       TEXT NOT NULL,
+    bytes      INTEGER,
+    sha256     TEXT,
+    downloaded REAL NOT NULL,
+    PRIMARY KEY (photo_id, size_key)
+)
+"""
+
+_SYNC_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_marks (
+    source      TEXT PRIMARY KEY,
+    uploaded    INTEGER,
+    last_update INTEGER,
+    set_update  INTEGER,
+    photo_ids   TEXT,
+    synced      REAL NOT NULL
+)
+"""
+
+
+class DownloadManifest:
+    """Records which photo id and size was saved to which file.
+
+    The database lives in the download directory (``MANIFEST_NAME``) and
+    runs in WAL mode, so a crash mid-job loses at most the photo being
+    written. Paths are stored relative to the directory, which can be moved
+    as a whole. One instance may be shared by all worker threads.
+    """
+
+    def __init__(self, download_dir):
+        self.download_dir = download_dir
+        self.path = os.path.join(download_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute(_SYNC_SCHEMA)
+        self._conn.commit()
+
+    def lookup(self, photo_id, size_key):
+        """Return the absolute path recorded for a photo, if it still exists.
+
+        Returns:
+            The file path, or None if the photo was never downloaded at this
+            size or its file has since been removed.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path FROM downloads WHERE photo_id = ? AND size_key = ?",
+                (str(photo_id), size_key),
+            ).fetchone()
+        if row is None:
+            return None
+        filepath = os.path.join(self.download_dir, row[0])
+        return filepath if os.path.exists(filepath) else None
+
+    def downloaded_at(self, photo_id, size_key):
+        """Return when a photo was last recorded at a size, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT downloaded FROM downloads "
+                "WHERE photo_id = ? AND size_key = ?",
+                (str(photo_id), size_key),
+            ).fetchone()
+        return row[0] if row else None
+
+    def record(self, photo_id, size_key, url, filepath, nbytes=None,
+               sha256=None):
+        """Record a finished download.
+
+        Args:
+            photo_id: Flickr photo id.
+            size_key: URL extras key the photo was requested at.
+            url: URL the bytes came from.
+            filepath: Final path of the file.
+            nbytes: Size of the file on disk, including any metadata
+                embedded in it.
+            sha256: Hex digest of the file on disk, likewise.
+        """
+        relpath = os.path.relpath(filepath, self.download_dir)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads "
+                "(photo_id, size_key, url, path, bytes, sha256, downloaded) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(photo_id), size_key, url, relpath, nbytes, sha256,
+                 time.time()),
+            )
+            self._conn.commit()
+
+    def sync_mark(self, source):
+        """Return the high-water mark saved for a sync source, or None.
+
+        Returns:
+            Dict with 'uploaded' and 'last_update' (Unix times), 'set_update'
+            (an album's date_update), 'photo_ids' (set of ids) and 'synced',
+            or None if the source was never synced into this directory.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT uploaded, last_update, set_update, photo_ids, synced "
+                "FROM sync_marks WHERE source = ?", (source,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "uploaded": row[0],
+            "last_update": row[1],
+            "set_update": row[2],
+            "photo_ids": set(json.loads(row[3])) if row[3] else set(),
+            "synced": row[4],
+        }
+
+    def save_sync_mark(self, source, uploaded=None, last_update=None,
+                       set_update=None, photo_ids=None):
+        """Record how far a sync source has been downloaded.
+
+        Args:
+            source: Key naming what was synced, e.g. "user:<nsid>:url_l".
+            uploaded: Upload time of the newest photo such that every
+                older one is downloaded.
+            last_update: Newest lastupdate time among the listed photos.
+            set_update: The album's date_update, if it is fully downloaded.
+            photo_ids: Ids of the album photos already downloaded.
+        """
+        ids = json.dumps(sorted(photo_ids)) if photo_ids is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_marks "
+                "(source, uploaded, last_update, set_update, photo_ids, synced) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (source, uploaded, last_update, set_update, ids, time.time()),
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM downloads").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,404 @@
+"""asyncio download engine built on top of FlickrDownloader."""
+
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import flickr_downloader as core
+from retry_policy import RETRY_STATUSES
+
+# aiohttp lets one event loop drive every transfer; without it each
+# transfer is handed to the loop's default thread pool via http_pool.
+_HAS_AIOHTTP = False
+try:
+    import aiohttp
+    _HAS_AIOHTTP = True
+except ImportError:
+    pass
+
+# Transfers in flight per download_photos_async call, and per image host
+DEFAULT_MAX_IN_FLIGHT = 64
+DEFAULT_MAX_PER_HOST = 8
+# Response bytes gathered before each hand-off to a writer thread; every
+# job shares the loop, so no file I/O runs on it
+_WRITE_BATCH = 512 * 1024
+
+
+class AsyncFlickrDownloader(core.FlickrDownloader):
+    """FlickrDownloader with coroutine versions of the fetch and download methods.
+
+    Callbacks, cancellation, filename templates and metadata embedding are
+    shared with the threaded engine. Flickr API calls go through the
+    synchronous flickrapi client on a worker thread; image transfers run on
+    the event loop when aiohttp is installed.
+    """
+
+    # --- Fetch methods ---
+
+    async def fetch_interestingness_async(self, date_str, count,
+                                          use_cache=True):
+        return await asyncio.to_thread(
+            self.fetch_interestingness, date_str, count, use_cache)
+
+    async def fetch_interestingness_range_async(self, start_date, end_date,
+                                                count_per_day, **kwargs):
+        return await asyncio.to_thread(
+            self.fetch_interestingness_range, start_date, end_date,
+            count_per_day, **kwargs)
+
+    async def search_photos_async(self, **kwargs):
+        return await asyncio.to_thread(self.search_photos, **kwargs)
+
+    async def resolve_user_async(self, username_or_url, use_cache=True):
+        return await asyncio.to_thread(
+            self.resolve_user, username_or_url, use_cache)
+
+    async def fetch_user_albums_async(self, user_nsid, use_cache=True):
+        return await asyncio.to_thread(
+            self.fetch_user_albums, user_nsid, use_cache)
+
+    async def fetch_user_photos_async(self, user_nsid, count,
+                                      use_cache=True):
+        return await asyncio.to_thread(
+            self.fetch_user_photos, user_nsid, count, use_cache)
+
+    async def fetch_album_photos_async(self, user_nsid, photoset_id,
+                                       use_cache=True):
+        return await asyncio.to_thread(
+            self.fetch_album_photos, user_nsid, photoset_id, use_cache)
+
+    # --- Download engine ---
+
+    async def download_photos_async(self, photos, download_dir,
+                                    size_key="url_l", embed_metadata=True,
+                                    filename_template="{title}_{id}",
+                                    max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                                    max_per_host=DEFAULT_MAX_PER_HOST,
+                                    use_manifest=True, content_store=None,
+                                    embed_processes=core.DEFAULT_EMBED_PROCESSES,
+                                    group_by=None,
+                                    max_deferrals=core.DEFAULT_MAX_DEFERRALS,
+                                    replace=()):
+        """Download photos to a local directory on the running event loop.
+
+        Args:
+            photos: List of Photo records (or raw photo dicts) from fetch
+                methods, or any iterable of them such as a PhotoStream;
+                pages of a stream are fetched on a worker thread while
+                transfers continue.
+            download_dir: Destination directory.
+            size_key: URL extras key for desired size.
+            embed_metadata: Whether to write IPTC/XMP/EXIF metadata,
+                "stream" to splice it into JPEGs as they download, or
+                "sidecar" to write .xmp files and leave images untouched.
+            filename_template: Template with {id}, {title}, {owner} placeholders.
+            max_in_flight: Number of photos transferred concurrently.
+            max_per_host: Concurrent transfers allowed per image host.
+                Nearly every photo is served by live.staticflickr.com, so
+                this caps the whole download, below max_in_flight by
+                default.
+            use_manifest: Record downloads in a DownloadManifest in
+                download_dir and skip photos it already lists.
+            content_store: Optional ContentStore (or directory path for
+                one) to keep each file once and link it into download_dir.
+            embed_processes: Worker processes that embed metadata; 0 embeds
+                on the loop's worker threads. As with download_photos, the
+                calling script needs an ``if __name__ == "__main__"`` guard.
+            group_by: Optional photo field whose value names a subfolder
+                for each photo.
+            max_deferrals: Times a throttled or failing photo is put off
+                while the others continue before it is retried inline.
+            replace: Ids of photos to download again over what is on disk.
+
+        Returns:
+            Tuple of (downloaded_count, skipped_count, failed_count).
+        """
+        run = core._DownloadRun(download_dir, size_key, embed_metadata,
+                                filename_template, use_manifest,
+                                content_store, embed_processes, self._log,
+                                group_by, max_deferrals, replace)
+        try:
+            return await self._download_all_async(
+                photos, run, max_in_flight, max_per_host)
+        finally:
+            run.close()
+            self.metadata_failures = run.metadata_failures
+            self.retry_summary = run.retry_summary
+
+    async def _download_all_async(self, photos, run, max_in_flight,
+                                  max_per_host):
+        counts = {"downloaded": 0, "skipped": 0, "failed": 0}
+        completed = 0
+
+        host_slots = {}
+        queue = enumerate(self._resolve_ahead(photos, run))
+        sized = isinstance(photos, (list, tuple))
+        queue_lock = asyncio.Lock()
+
+        async def next_photo():
+            # Pulling may block on an API page fetch or a getSizes lookup
+            async with queue_lock:
+                try:
+                    return await asyncio.to_thread(next, queue, None)
+                except core.CancelledError:
+                    return None
+
+        session = None
+        if _HAS_AIOHTTP:
+            session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=None, sock_read=30,
+                                              sock_connect=30),
+                connector=aiohttp.TCPConnector(
+                    limit=max_in_flight, limit_per_host=max_per_host),
+            )
+
+        exhausted = False
+        busy = 0
+
+        async def worker():
+            nonlocal completed, exhausted, busy
+            # Workers share one iterator, so at most max_in_flight photos
+            # are ever in progress regardless of the list length.
+            while not self._cancelled:
+                # Deferred photos go first once they are due
+                item = run.pop_deferred()
+                retry = item is not None
+                if not retry and not exhausted:
+                    item = await next_photo()
+                    if item is None:
+                        exhausted = True
+                        continue
+                if item is None:
+                    # A photo still in progress may yet be deferred
+                    if not busy and not run.deferred_count():
+                        return
+                    delay = run.deferred_delay()
+                    await asyncio.sleep(0.25 if delay is None
+                                        else min(delay, 0.25))
+                    continue
+                i, photo = item
+                total = core._expected_total(photos, i + 1)
+                busy += 1
+                try:
+                    outcome = await self._download_one_async(
+                        session, photo, i, total, run, host_slots,
+                        max_per_host)
+                finally:
+                    busy -= 1
+                if outcome is None or outcome == "deferred":
+                    continue
+                if retry:
+                    run.settle(photo.id, outcome)
+                counts[outcome] += 1
+                completed += 1
+                self._progress(completed,
+                               core._expected_total(photos, completed))
+
+        try:
+            workers = max(1, int(max_in_flight))
+            if sized:
+                workers = min(workers, len(photos) or 1)
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        finally:
+            if session is not None:
+                await session.close()
+
+        if self._cancelled:
+            self._log("Download cancelled.")
+        elif not sized:
+            self._progress(completed, completed)
+
+        return self._report_totals(counts, run)
+
+    async def _download_one_async(self, session, photo, i, total, run,
+                                  host_slots, max_per_host):
+        """Coroutine counterpart of FlickrDownloader._download_one."""
+        if self._cancelled:
+            return None
+        if isinstance(photo, dict):
+            photo = core.Photo.from_api(photo)
+        if await asyncio.to_thread(self._in_manifest, photo, i, total, run):
+            return "skipped"
+        if run.store is not None:
+            stored = await asyncio.to_thread(
+                self._from_store, photo, i, total, run)
+            if stored:
+                return stored
+
+        url = self._url_from_extras(photo, run.size_key)
+        if not url:
+            # Prefetched by _resolve_ahead, or a blocking getSizes call
+            url = await asyncio.to_thread(self._photo_url, photo, run)
+        target = await asyncio.to_thread(
+            self._claim_target, photo, url, i, total, run)
+        if isinstance(target, str):
+            return target
+        filepath, label, title, owner = target
+
+        host = urlsplit(url).hostname or ""
+        slot = host_slots.get(host)
+        if slot is None:
+            slot = host_slots[host] = asyncio.Semaphore(max_per_host)
+
+        try:
+            async with slot:
+                if self._cancelled:
+                    run.release(filepath)
+                    return None
+                self._log(f"  [{i+1}/{total}] Downloading: {label}")
+                metadata = self._splice_fields(
+                    photo, filepath, title, owner, run)
+                deferrals, defer = run.deferrals(photo.id)
+                if session is not None:
+                    fetched = await self._fetch_to_file_async(
+                        session, url, filepath, metadata=metadata,
+                        attempt=deferrals, defer=defer)
+                else:
+                    fetched = await asyncio.to_thread(
+                        self._fetch_to_file, url, filepath,
+                        metadata=metadata, attempt=deferrals, defer=defer)
+
+            if fetched is None or self._cancelled:
+                # The .part file is kept so the next run can resume it
+                run.release(filepath)
+                return None
+
+            await asyncio.to_thread(
+                self._finish_download, photo, url, filepath, fetched,
+                title, owner, run)
+            return "downloaded"
+
+        except core.CancelledError:
+            run.release(filepath)
+            return None
+        except core._Deferred as e:
+            run.release(filepath)
+            return self._defer(photo, i, total, run, e)
+        except Exception as e:
+            self._log(f"  [{i+1}/{total}] Failed: {e}")
+            run.release(filepath)
+            return "failed"
+
+    async def _stream_to_part(self, resp, out):
+        """Write a response body through a _PartWriter on worker threads.
+
+        Chunks are gathered into batches of about _WRITE_BATCH bytes and
+        each batch is written, hashed and spliced off the loop, in order.
+        The writer is closed before returning.
+
+        Returns:
+            True once the body is written, False if cancelled.
+        """
+        batch = []
+        batched = 0
+        finished = False
+        try:
+            async for chunk in resp.content.iter_chunked(65536):
+                if self._cancelled:
+                    return False
+                batch.append(chunk)
+                batched += len(chunk)
+                if batched >= _WRITE_BATCH:
+                    data, batch, batched = b"".join(batch), [], 0
+                    await asyncio.to_thread(out.write, data)
+            finished = True
+        finally:
+            # Bytes already received are kept for a resume
+            if batch:
+                await asyncio.to_thread(out.write, b"".join(batch))
+            await asyncio.to_thread(
+                out.__exit__, None if finished else core.CancelledError,
+                None, None)
+        return True
+
+    async def _backoff_sleep_async(self, wait):
+        """Coroutine form of _backoff_sleep."""
+        deadline = time.monotonic() + wait
+        while True:
+            if self._cancelled:
+                raise core.CancelledError("Operation cancelled")
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return
+            await asyncio.sleep(min(left, 0.25))
+
+    async def _fetch_to_file_async(self, session, url, filepath,
+                                   max_resumes=3, metadata=None,
+                                   attempt=0, defer=False):
+        """aiohttp counterpart of FlickrDownloader._fetch_to_file.
+
+        Retries 429s, 5xx replies, refused connections and timeouts under
+        the retry policy, or raises _Deferred for them with ``defer``, and
+        resumes the .part file after a body is cut off mid-way.
+
+        Returns:
+            Tuple of (path of the completed .part file, SHA-256 hex digest
+            of its contents, whether metadata was spliced in), or None if
+            cancelled.
+        """
+        part = filepath + core.PART_SUFFIX
+        hasher = core._PartHasher(part)
+        started = time.monotonic()
+        resumes = 0
+        while True:
+            offset, meta = await asyncio.to_thread(
+                core._read_part_meta, part, url)
+            headers = core._range_headers(offset, meta)
+            if self._cancelled or not await self.rate_limiter.acquire_async(
+                    should_stop=lambda: self._cancelled):
+                raise core.CancelledError("Operation cancelled")
+            out = None
+            try:
+                async with session.get(url, headers=headers) as resp:
+                    if resp.status in RETRY_STATUSES:
+                        wait = self._retry_wait(
+                            attempt, started, defer, status=resp.status,
+                            headers=resp.headers)
+                        if wait is not None:
+                            attempt += 1
+                            await self._backoff_sleep_async(wait)
+                            continue
+                    if resp.status == 416 and headers:
+                        if meta.get("size") == offset:
+                            # Re-reads a .part file left by an earlier run
+                            await asyncio.to_thread(
+                                hasher.resume,
+                                offset + meta.get("shift", 0))
+                            return (part, hasher.hexdigest(),
+                                    bool(meta.get("spliced")))
+                        await asyncio.to_thread(core._remove_part, part)
+                        continue
+                    resp.raise_for_status()
+                    self.rate_limiter.success()
+                    self.retries.success()
+
+                    start = core._response_offset(
+                        resp.status, resp.headers, offset)
+                    size = core._response_size(
+                        resp.status, resp.headers, start)
+                    # Opening may re-read an earlier run's .part file to
+                    # seed the hash
+                    out = await asyncio.to_thread(
+                        core._PartWriter, part, url, resp.headers, size,
+                        start, meta, hasher, metadata)
+                    if not await self._stream_to_part(resp, out):
+                        return None
+            except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError,
+                    asyncio.TimeoutError) as e:
+                wait = self._resume_wait(e, out, attempt, started, resumes,
+                                         max_resumes, defer)
+                if wait is None:
+                    raise
+                if out is not None and out.written:
+                    resumes += 1
+                attempt += 1
+                await self._backoff_sleep_async(wait)
+                continue
+
+            if await asyncio.to_thread(
+                    core._part_complete, part, out.expected_size):
+                return part, hasher.hexdigest(), out.spliced
+            if resumes >= max_resumes:
+                raise IOError(
+                    f"Transfer incomplete after {resumes + 1} attempts")
+            resumes += 1
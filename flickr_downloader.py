@@ -1,14 +1,41 @@
 #!/usr/bin/env python3
 """Core logic for the Flickr Photo Downloader application."""
 
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import multiprocessing
 import os
+import queue
 import re
+import string
+import threading
 import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 
-import flickrapi
 import requests
 from dotenv import load_dotenv
 
+import flickr_client
+import http_pool
+from content_store import ContentStore
+from download_manifest import DownloadManifest
+from jpeg_metadata import JpegSplicer, xmp_packet
+from photo import URL_KEYS, Photo
+from photo_table import PhotoTable
+from retry_policy import RetryPolicy, RetryTracker
+from shard_queue import ShardQueue
+
 # Metadata support: prefer pyexiv2, fall back to piexif
 _HAS_PYEXIV2 = False
 _HAS_PIEXIF = False
@@ -35,15 +62,90 @@ PHOTO_SIZES = {
     "Medium 800": "url_c",
     "Large 1024": "url_l",
     "Large 1600": "url_h",
+    "Large 2048": "url_k",
+    "X-Large 3K": "url_3k",
+    "X-Large 4K": "url_4k",
     "Original": "url_o",
+    # Largest size whose longest edge fits; see _max_edge
+    "Up to 2048 px": "max:2048",
+    "Up to 4096 px": "max:4096",
 }
 
-# All extras we request so photo dicts include URLs and metadata
+# All extras we request so photos include URLs and metadata
 _EXTRAS = (
-    "url_sq,url_t,url_s,url_n,url_m,url_z,url_c,url_l,url_h,url_o,"
-    "description,tags,owner_name,date_taken"
+    "url_sq,url_t,url_s,url_n,url_m,url_z,url_c,url_l,url_h,url_k,url_3k,"
+    "url_4k,url_o,"
+    "description,tags,owner_name,date_taken,license,date_upload,last_update,"
+    "o_dims"
 )
 
+# url_* keys from largest to smallest; Flickr serves url_m and below for
+# every photo, so a request for a larger size only needs fallbacks down to it
+_SIZE_ORDER = URL_KEYS
+_ALWAYS_SERVED = "url_m"
+
+# Longest edge of each size; the original's depends on the photo
+_NOMINAL_EDGES = {
+    "url_sq": 75, "url_t": 100, "url_s": 240, "url_n": 320, "url_m": 500,
+    "url_z": 640, "url_c": 800, "url_l": 1024, "url_h": 1600, "url_k": 2048,
+    "url_3k": 3072, "url_4k": 4096,
+}
+
+# photos.getSizes labels of the sizes that have url_* extras
+_SIZE_LABELS = {
+    "Square": "url_sq", "Thumbnail": "url_t", "Small": "url_s",
+    "Small 320": "url_n", "Medium": "url_m", "Medium 640": "url_z",
+    "Medium 800": "url_c", "Large": "url_l", "Large 1600": "url_h",
+    "Large 2048": "url_k", "X-Large 3K": "url_3k", "X-Large 4K": "url_4k",
+    "Original": "url_o",
+}
+
+# Extras read by each embed_metadata mode
+_METADATA_EXTRAS = {
+    True: ("description", "tags", "owner_name"),
+    "stream": ("description", "tags", "owner_name"),
+    "sidecar": ("description", "tags", "owner_name", "date_taken", "license"),
+}
+
+# Extras incremental sync reads to place its marks
+_SYNC_EXTRAS = ("date_upload", "last_update")
+
+# Photos downloaded in flight. Nearly every image comes from the single
+# host live.staticflickr.com, so the per-host limit defaults to this too.
+DEFAULT_MAX_WORKERS = 4
+
+# API result pages fetched concurrently once the page count is known
+DEFAULT_PAGE_WORKERS = 4
+
+# Worker processes that embed metadata (0 embeds on the download threads).
+# Opt-in: worker processes are spawned, which re-imports the caller's
+# __main__, so a script using them needs an ``if __name__ == "__main__"``
+# guard.
+DEFAULT_EMBED_PROCESSES = 0
+
+# photos.search stops returning new results past this many per query
+SEARCH_RESULT_CAP = 4000
+# Shards counted and fetched concurrently by the sharded searches
+DEFAULT_SHARD_WORKERS = 4
+# Earliest upload date worth searching (Flickr launched in February 2004)
+_FLICKR_EPOCH = 1075593600
+# Earliest taken date searched (1800-01-01); scans and old cameras carry
+# dates long before Flickr existed
+_TAKEN_EPOCH = -5364662400
+# Geo searches stop subdividing tiles smaller than this many degrees
+DEFAULT_MIN_TILE = 0.001
+# Days of Explore listed concurrently by the interestingness range source
+DEFAULT_DAY_WORKERS = 4
+# photos.getSizes lookups run ahead of the download loop concurrently
+DEFAULT_SIZES_WORKERS = 4
+# Times a throttled or failing photo is put off before it is retried inline
+DEFAULT_MAX_DEFERRALS = 3
+
+# In-progress downloads are written to "<name>.part" and renamed when
+# complete; "<name>.part.json" holds the validators used to resume them.
+PART_SUFFIX = ".part"
+_PART_META_SUFFIX = ".json"
+
 # Characters not allowed in Windows filenames
 _RESERVED_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
 _RESERVED_NAMES = {
@@ -65,6 +167,9 @@ LICENSE_MAP = {
     "Public Domain Mark": "10",
 }
 
+# License names by the id Flickr reports in a photo's "license" field
+LICENSE_NAMES = {v: k for k, v in LICENSE_MAP.items()}
+
 SORT_OPTIONS = {
     "Relevance": "relevance",
     "Date Posted (Newest)": "date-posted-desc",
@@ -76,22 +181,317 @@ SORT_OPTIONS = {
 }
 
 
-class FlickrDownloader:
-    """Handles all Flickr API calls and photo downloading."""
+class _HostLimiter:
+    """Caps the number of concurrent transfers to each download host."""
 
-    def __init__(self, api_key, api_secret):
-        self.flickr = flickrapi.FlickrAPI(
-            api_key, api_secret, format="parsed-json"
-        )
+    def __init__(self, max_per_host):
+        self._max = max(1, int(max_per_host))
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url):
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            sem = self._slots.get(host)
+            if sem is None:
+                sem = self._slots[host] = threading.BoundedSemaphore(self._max)
+        with sem:
+            yield
+
+
+class _DownloadRun:
+    """Options and shared state for one download_photos call."""
+
+    def __init__(self, download_dir, size_key, embed_metadata,
+                 filename_template, use_manifest, content_store=None,
+                 embed_processes=0, log=None, group_by=None,
+                 max_deferrals=0, replace=()):
+        os.makedirs(download_dir, exist_ok=True)
+        self.download_dir = download_dir
+        self.size_key = size_key
+        self.embed_metadata = embed_metadata
+        self.filename_template = filename_template
+        self.group_by = group_by
+        # Photo ids downloaded again over whatever is already on disk
+        self.replace = frozenset(replace)
+        self.manifest = (DownloadManifest(download_dir)
+                         if use_manifest else None)
+        # A store given by path is opened (and closed) by this run
+        self._owns_store = isinstance(content_store, str)
+        self.store = (ContentStore(content_store) if self._owns_store
+                      else content_store)
+        # Metadata is embedded in worker processes unless embed_processes is 0
+        self.embedder = (_EmbedStage(embed_processes)
+                         if embed_metadata in (True, "stream")
+                         and embed_processes > 0
+                         and (_HAS_PYEXIV2 or _HAS_PIEXIF) else None)
+        self.sidecars = (_SidecarWriter(self._sidecar_failed)
+                         if embed_metadata == "sidecar" else None)
+        self.metadata_failures = 0
+        # getSizes answers looked up ahead of the downloads, by photo id
+        self.urls = {}
+        # Photos put off after a retryable failure, as a heap of
+        # (ready time, sequence, index, photo), and deferrals per photo id
+        self.max_deferrals = max_deferrals
+        self.retry_summary = {"deferred": 0, "recovered": 0, "failed": 0}
+        self._deferred = []
+        self._deferrals = {}
+        self._sequence = itertools.count()
+        self._log = log
+        self._claimed = set()
+        self._lock = threading.Lock()
+
+    def claim(self, filepath, replace=False):
+        """Reserve a filename; False if it exists or another worker has it.
+
+        With ``replace`` an existing file may be claimed, to be overwritten.
+        """
+        with self._lock:
+            if filepath in self._claimed or (
+                    not replace and os.path.exists(filepath)):
+                return False
+            self._claimed.add(filepath)
+            return True
+
+    def release(self, filepath):
+        """Give up a filename reserved with claim()."""
+        with self._lock:
+            self._claimed.discard(filepath)
+
+    def metadata_failed(self):
+        with self._lock:
+            self.metadata_failures += 1
+
+    def deferrals(self, photo_id):
+        """Return (times a photo was put off, whether it may be again)."""
+        with self._lock:
+            count = self._deferrals.get(photo_id, 0)
+        return count, count < self.max_deferrals
+
+    def defer(self, photo, i, wait):
+        """Put a photo off for ``wait`` seconds while the others continue."""
+        with self._lock:
+            count = self._deferrals.get(photo.id, 0)
+            if not count:
+                self.retry_summary["deferred"] += 1
+            self._deferrals[photo.id] = count + 1
+            heapq.heappush(self._deferred, (time.monotonic() + wait,
+                                            next(self._sequence), i, photo))
+
+    def pop_deferred(self):
+        """Return (index, photo) of a deferred photo that is due, or None."""
+        with self._lock:
+            if self._deferred and self._deferred[0][0] <= time.monotonic():
+                _ready, _seq, i, photo = heapq.heappop(self._deferred)
+                return i, photo
+        return None
+
+    def deferred_delay(self):
+        """Seconds until the next deferred photo is due, None if none are."""
+        with self._lock:
+            if not self._deferred:
+                return None
+            return max(0.0, self._deferred[0][0] - time.monotonic())
+
+    def deferred_count(self):
+        with self._lock:
+            return len(self._deferred)
+
+    def drop_deferred(self):
+        with self._lock:
+            self._deferred.clear()
+
+    def settle(self, photo_id, outcome):
+        """Tally the final outcome of a photo that had been deferred."""
+        with self._lock:
+            if outcome == "downloaded":
+                self.retry_summary["recovered"] += 1
+            elif outcome == "failed":
+                self.retry_summary["failed"] += 1
+
+    def _sidecar_failed(self, path, error):
+        if self._log is not None:
+            self._log(f"  Sidecar not written: {os.path.basename(path)}: {error}")
+        self.metadata_failed()
+
+    def close(self):
+        if self.embedder is not None:
+            self.embedder.close()
+        if self.sidecars is not None:
+            self.sidecars.close()
+        if self.manifest is not None:
+            self.manifest.close()
+        if self._owns_store:
+            self.store.close()
+
+
+class RateLimiter:
+    """Adaptive token bucket shared by API calls and photo downloads.
+
+    Every request takes one token. The refill rate grows additively while
+    responses are clean and is cut multiplicatively when Flickr answers
+    429, which also pauses all callers until any Retry-After has passed.
+    Pass one instance to several FlickrDownloader objects to make them
+    share a single request budget.
+    """
+
+    def __init__(self, rate=4.0, burst=8, min_rate=0.5, max_rate=20.0,
+                 increase=0.1, decrease=0.5):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._rate = min(max(rate, min_rate), max_rate)
+        self._burst = max(1, burst)
+        self._tokens = float(self._burst)
+        self._stamp = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        """Current refill rate in requests per second."""
+        return self._rate
+
+    def acquire(self, should_stop=None):
+        """Block until a request may be sent.
+
+        Args:
+            should_stop: Optional callable polled while waiting; when it
+                returns True the wait is abandoned.
+
+        Returns:
+            True if a token was taken, False if the wait was abandoned.
+        """
+        while True:
+            if should_stop and should_stop():
+                return False
+            wait = self._take()
+            if wait is None:
+                return True
+            # Sleep in short slices so cancellation stays responsive
+            time.sleep(min(max(wait, 0.01), 0.25))
+
+    async def acquire_async(self, should_stop=None):
+        """Coroutine form of acquire() that waits without blocking the loop."""
+        while True:
+            if should_stop and should_stop():
+                return False
+            wait = self._take()
+            if wait is None:
+                return True
+            await asyncio.sleep(min(max(wait, 0.01), 0.25))
+
+    def success(self):
+        """Record a clean response (additive increase)."""
+        with self._lock:
+            self._rate = min(self.max_rate, self._rate + self.increase)
+
+    def throttled(self, retry_after=None):
+        """Record a 429 response (multiplicative decrease).
+
+        Args:
+            retry_after: Seconds to pause every caller, if the server said.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._rate = max(self.min_rate, self._rate * self.decrease)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until,
+                                          now + retry_after)
+
+    def _take(self):
+        """Take a token if one is free; otherwise return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self._blocked_until and self._tokens >= 1:
+                self._tokens -= 1
+                return None
+            return max(self._blocked_until - now,
+                       (1 - self._tokens) / self._rate)
+
+    def _refill(self, now):
+        elapsed = now - self._stamp
+        self._stamp = now
+        self._tokens = min(self._burst, self._tokens + elapsed * self._rate)
+
+
+class PhotoStream:
+    """Iterable of Photo records fetched lazily, one API page at a time.
+
+    ``total`` is None until the first page arrives, then holds the number
+    of photos the listing is expected to produce. Only the current page is
+    kept in memory, and a stream can be iterated once. For sharded searches
+    ``shards`` fills with one dict per finished shard.
+    """
+
+    def __init__(self, pages):
+        self._pages = pages
+        self.total = None
+        self.shards = []
+
+    def __iter__(self):
+        for batch, total in self._pages:
+            self.total = total
+            yield from batch
+
+
+class FlickrDownloader:
+    """Handles all Flickr API calls and photo downloading.
+
+    A downloader is cheap: it holds one job's cancel flag, callbacks and
+    options, while API calls go through the process-wide FlickrClient for
+    its key, so create one per job or request.
+
+    API calls and downloads are retried under one RetryPolicy; pass the
+    same policy to every downloader to configure them together. Each
+    downloader counts its own retries in ``retries``.
+    """
+
+    def __init__(self, api_key, api_secret, rate_limiter=None, cache=None,
+                 client=None, retry_policy=None):
+        # Shared by every downloader using this key unless one is given
+        self.client = client or flickr_client.get_client(api_key, api_secret)
+        self.flickr = self.client.api
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # Optional ApiCache; pass one instance to several downloaders to share it
+        self.cache = cache
+        # Extras requested by the fetch methods; see limit_extras
+        self.extras = _EXTRAS
         self._cancelled = False
         self._progress_cb = None
         self._log_cb = None
+        # Photos saved without metadata by the last download_photos call
+        self.metadata_failures = 0
+        # Retry counters and budget of this job
+        self.retries = RetryTracker(retry_policy)
+        # Photos deferred by the last download_photos call, and how many of
+        # them were recovered or still failed on retry
+        self.retry_summary = {"deferred": 0, "recovered": 0, "failed": 0}
 
     def set_callbacks(self, progress_cb=None, log_cb=None):
         """Set callbacks for progress updates and log messages."""
         self._progress_cb = progress_cb
         self._log_cb = log_cb
 
+    def limit_extras(self, size_key="url_l", embed_metadata=True,
+                     filename_template="{title}_{id}", also=()):
+        """Have the fetch methods request only what a download will read.
+
+        By default every page carries all ten url_* sizes and every
+        metadata field. Call this with the options that will be passed to
+        download_photos to shrink each response to the requested size, its
+        fallbacks, and the fields metadata and filenames actually use.
+        ``also`` adds extras needed elsewhere, such as 'o_dims' for a
+        PhotoTable filter on original dimensions.
+        """
+        self.extras = photo_extras(size_key, embed_metadata,
+                                   filename_template, also)
+
     def cancel(self):
         self._cancelled = True
 
@@ -110,83 +510,273 @@ class FlickrDownloader:
         if self._progress_cb:
             self._progress_cb(current, total)
 
-    def _api_call(self, func, **kwargs):
-        """Call a Flickr API method with exponential backoff (3 attempts)."""
-        max_retries = 3
-        for attempt in range(max_retries):
-            if self._cancelled:
-                raise CancelledError("Operation cancelled")
+    def _api_call(self, func, use_cache=True, **kwargs):
+        """Call a Flickr API method, retrying under the retry policy.
+
+        Responses are served from and saved to ``self.cache`` when there is
+        one, unless ``use_cache`` is False.
+        """
+        method = getattr(func, "method_name", None)
+        cache = self.cache if use_cache and method else None
+        if cache is not None:
+            cached = cache.get(method, kwargs)
+            if cached is not None:
+                return cached
+
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            self._acquire_token()
             try:
-                return func(**kwargs)
+                result = self.client.call(func, **kwargs)
             except Exception as e:
-                if attempt == max_retries - 1:
+                kind, wait = self.retries.backoff(
+                    e, attempt=attempt, started=started)
+                if kind == "throttle":
+                    self.rate_limiter.throttled()
+                if wait is None:
                     raise
-                wait = 2 ** attempt
-                self._log(f"  API error: {e}. Retrying in {wait}s...")
-                time.sleep(wait)
+                self._log(f"  API error: {e}. Retrying in {wait:.1f}s...")
+                self._backoff_sleep(wait)
+                attempt += 1
+            else:
+                self.rate_limiter.success()
+                self.retries.success()
+                if cache is not None:
+                    cache.put(method, kwargs, result)
+                return result
+
+    def _acquire_token(self):
+        """Wait for the shared rate limiter, honouring cancellation."""
+        if self._cancelled or not self.rate_limiter.acquire(
+                should_stop=lambda: self._cancelled):
+            raise CancelledError("Operation cancelled")
+
+    def _backoff_sleep(self, wait):
+        """Sleep before a retry, raising CancelledError if cancelled."""
+        deadline = time.monotonic() + wait
+        while True:
+            if self._cancelled:
+                raise CancelledError("Operation cancelled")
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return
+            time.sleep(min(left, 0.25))
 
     # --- Fetch methods ---
 
-    def fetch_interestingness(self, date_str, count):
+    def _iter_pages(self, func, result_key, count, label,
+                    page_workers=DEFAULT_PAGE_WORKERS, use_cache=True,
+                    **kwargs):
+        """Yield (batch, expected_total) for each page of a paged API call.
+
+        The first page is fetched on its own to learn the page count; the
+        rest are fetched up to ``page_workers`` at a time and yielded in
+        page order. Photos repeated across pages are dropped.
+
+        Args:
+            func: flickrapi method to call.
+            result_key: Top-level response key holding the page ('photos'
+                or 'photoset').
+            count: Maximum number of photos to yield, or None for all.
+            label: Description used in the per-page log line.
+            page_workers: Pages fetched concurrently after the first.
+            use_cache: Whether pages may come from the API cache.
+            **kwargs: Extra arguments passed on every call.
+        """
+        per_page = min(count, 500) if count else 500
+        total_pages = (count + per_page - 1) // per_page if count else None
+        seen = set()
+        yielded = 0
+
+        def fetch(page):
+            if total_pages is None:
+                self._log(f"Fetching {label} page {page}...")
+            else:
+                self._log(f"Fetching {label} page {page}/{total_pages}...")
+            result = self._api_call(func, use_cache=use_cache,
+                                    per_page=per_page, page=page,
+                                    **kwargs)[result_key]
+            # Project each entry onto a Photo on the fetching thread, so
+            # the decoded page is dropped as soon as it arrives
+            result["photo"] = [Photo.from_api(entry)
+                               for entry in result["photo"]]
+            return result
+
+        def unique(batch):
+            fresh = []
+            for photo in batch:
+                if photo.id not in seen:
+                    seen.add(photo.id)
+                    fresh.append(photo)
+            return fresh
+
+        if self._cancelled:
+            return
+        result = fetch(1)
+        if not result["photo"]:
+            return
+        pages = int(result["pages"])
+        total_pages = min(total_pages, pages) if total_pages else pages
+        expected = int(result.get("total", 0) or 0)
+        if count:
+            expected = min(expected, count) if expected else count
+
+        pool = ThreadPoolExecutor(max_workers=max(1, page_workers))
+        try:
+            pending = deque()
+            next_page = 2
+            page_results = [result]
+            while page_results:
+                # Keep the next few pages in flight while this one is used
+                while next_page <= total_pages \
+                        and len(pending) < max(1, page_workers):
+                    pending.append(pool.submit(fetch, next_page))
+                    next_page += 1
+
+                result = page_results.pop()
+                batch = unique(result["photo"])
+                if count:
+                    batch = batch[:count - yielded]
+                yielded += len(batch)
+                yield batch, max(expected, yielded)
+
+                if (count and yielded >= count) or self._cancelled:
+                    break
+                if pending:
+                    result = pending.popleft().result()
+                    if result["photo"]:
+                        page_results.append(result)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def iter_interestingness(self, date_str, count, use_cache=True):
+        """Stream photos from the Interestingness feed page by page.
+
+        Same arguments as fetch_interestingness; returns a PhotoStream.
+        """
+        return PhotoStream(self._iter_pages(
+            self.flickr.interestingness.getList, "photos", count,
+            "interestingness", use_cache=use_cache, date=date_str,
+            extras=self.extras,
+        ))
+
+    def fetch_interestingness(self, date_str, count, use_cache=True):
         """Fetch photos from Flickr's Interestingness/Explore feed.
 
         Args:
             date_str: Date in YYYY-MM-DD format.
             count: Number of photos to fetch (max 500).
+            use_cache: False to bypass the API cache for this call.
 
         Returns:
-            List of photo dicts with URL extras.
+            List of Photo records.
         """
-        photos = []
-        per_page = min(count, 500)
-        total_pages = (count + per_page - 1) // per_page
-
-        for page in range(1, total_pages + 1):
-            if self._cancelled:
-                break
-            self._log(f"Fetching interestingness page {page}/{total_pages}...")
-            resp = self._api_call(
-                self.flickr.interestingness.getList,
-                date=date_str,
-                extras=_EXTRAS,
-                per_page=per_page,
-                page=page,
-            )
-            batch = resp["photos"]["photo"]
-            if not batch:
-                break
-            photos.extend(batch)
-            if page >= int(resp["photos"]["pages"]):
-                break
-
-        photos = photos[:count]
+        photos = list(self.iter_interestingness(date_str, count, use_cache))
         self._log(f"Found {len(photos)} interestingness photos.")
         return photos
 
-    def search_photos(self, text="", tags="", tag_mode="any",
-                      sort="relevance", license_ids="", count=100,
-                      user_id=""):
-        """Search Flickr for photos matching criteria.
+    def iter_interestingness_range(self, start_date, end_date, count_per_day,
+                                   day_workers=DEFAULT_DAY_WORKERS,
+                                   use_cache=True):
+        """Stream the Explore lists of a range of days.
+
+        Same arguments as fetch_interestingness_range; returns a PhotoStream.
+        """
+        start = date.fromisoformat(start_date)
+        end = date.fromisoformat(end_date)
+        if end < start:
+            raise ValueError("End date is before the start date.")
+        days = [(start + timedelta(days=n)).isoformat()
+                for n in range((end - start).days + 1)]
+        return PhotoStream(self._iter_days(
+            days, count_per_day, day_workers, use_cache))
+
+    def fetch_interestingness_range(self, start_date, end_date, count_per_day,
+                                    day_workers=DEFAULT_DAY_WORKERS,
+                                    use_cache=True):
+        """Fetch the Explore lists of every day from start_date to end_date.
+
+        Days are listed ``day_workers`` at a time. Each photo's explore_date
+        names the day it was listed for, so
+        ``download_photos(..., group_by="explore_date")`` can file it in a
+        folder per day. A photo featured on several days is kept once.
 
         Args:
-            text: Free-text search query.
-            tags: Comma-separated tags.
-            tag_mode: 'any' or 'all'.
-            sort: Sort order (flickr API value).
-            license_ids: Comma-separated license IDs.
-            count: Number of results (max 4000).
-            user_id: Optional user NSID to restrict results to.
+            start_date: First day in YYYY-MM-DD format.
+            end_date: Last day in YYYY-MM-DD format, inclusive.
+            count_per_day: Number of photos to fetch per day (max 500).
+            day_workers: Days fetched concurrently.
+            use_cache: False to bypass the API cache for this call.
 
         Returns:
-            List of photo dicts with URL extras.
+            List of Photo records.
         """
-        photos = []
-        per_page = min(count, 500)
-        total_pages = (count + per_page - 1) // per_page
+        photos = list(self.iter_interestingness_range(
+            start_date, end_date, count_per_day, day_workers, use_cache))
+        self._log(f"Found {len(photos)} interestingness photos "
+                  f"from {start_date} to {end_date}.")
+        return photos
+
+    def _iter_days(self, days, count_per_day, workers, use_cache):
+        """Yield (batch, expected_total) for each day's Explore list, in order."""
+        expected = len(days) * count_per_day
+        seen = set()
+        yielded = 0
+
+        def fetch(day):
+            photos = list(self.iter_interestingness(
+                day, count_per_day, use_cache))
+            for photo in photos:
+                photo.explore_date = day
+            return photos
+
+        todo = iter(days)
+        pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            pending = deque()
+            while True:
+                # Keep the next few days listing while this one is used
+                while len(pending) < max(1, workers) and not self._cancelled:
+                    day = next(todo, None)
+                    if day is None:
+                        break
+                    pending.append((day, pool.submit(fetch, day)))
+                if not pending:
+                    return
+                day, future = pending.popleft()
+                batch = []
+                for photo in future.result():
+                    if photo.id not in seen:
+                        seen.add(photo.id)
+                        batch.append(photo)
+                yielded += len(batch)
+                self._log(f"  {day}: {len(batch)} photos")
+                yield batch, max(expected, yielded)
+                if self._cancelled:
+                    return
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
 
+    def iter_search_photos(self, text="", tags="", tag_mode="any",
+                           sort="relevance", license_ids="", count=100,
+                           user_id="", use_cache=True):
+        """Stream search results page by page.
+
+        Same arguments as search_photos; returns a PhotoStream.
+        """
+        kwargs = self._search_kwargs(text, tags, tag_mode, sort,
+                                     license_ids, user_id)
+        return PhotoStream(self._iter_pages(
+            self.flickr.photos.search, "photos", count, "search results",
+            use_cache=use_cache, **kwargs,
+        ))
+
+    def _search_kwargs(self, text="", tags="", tag_mode="any",
+                       sort="relevance", license_ids="", user_id=""):
+        """Build photos.search arguments from the search_photos options."""
         kwargs = {
-            "extras": _EXTRAS,
-            "per_page": per_page,
+            "extras": self.extras,
             "sort": sort,
             "safe_search": 1,
         }
@@ -199,28 +789,355 @@ class FlickrDownloader:
             kwargs["license"] = license_ids
         if user_id:
             kwargs["user_id"] = user_id
+        return kwargs
 
-        for page in range(1, total_pages + 1):
-            if self._cancelled:
-                break
-            self._log(f"Fetching search results page {page}/{total_pages}...")
-            resp = self._api_call(self.flickr.photos.search, page=page, **kwargs)
-            batch = resp["photos"]["photo"]
-            if not batch:
-                break
-            photos.extend(batch)
-            if page >= int(resp["photos"]["pages"]):
-                break
+    def search_photos(self, text="", tags="", tag_mode="any",
+                      sort="relevance", license_ids="", count=100,
+                      user_id="", use_cache=True):
+        """Search Flickr for photos matching criteria.
+
+        Args:
+            text: Free-text search query.
+            tags: Comma-separated tags.
+            tag_mode: 'any' or 'all'.
+            sort: Sort order (flickr API value).
+            license_ids: Comma-separated license IDs.
+            count: Number of results (max 4000; see search_photos_sharded
+                for more).
+            user_id: Optional user NSID to restrict results to.
+            use_cache: False to bypass the API cache for this call.
 
-        photos = photos[:count]
+        Returns:
+            List of Photo records.
+        """
+        photos = list(self.iter_search_photos(
+            text=text, tags=tags, tag_mode=tag_mode, sort=sort,
+            license_ids=license_ids, count=count, user_id=user_id,
+            use_cache=use_cache,
+        ))
         self._log(f"Found {len(photos)} photos from search.")
         return photos
 
-    def resolve_user(self, username_or_url):
+    def iter_search_photos_sharded(self, text="", tags="", tag_mode="any",
+                                   license_ids="", user_id="", count=None,
+                                   date_field="upload", min_date=None,
+                                   max_date=None,
+                                   shard_workers=DEFAULT_SHARD_WORKERS,
+                                   state_path=None, use_cache=True):
+        """Stream every result of a search, past the 4000-result cap.
+
+        Same arguments as search_photos_sharded; returns a PhotoStream whose
+        ``shards`` lists each date window with its expected and fetched
+        photo counts.
+        """
+        kwargs = self._search_kwargs(text, tags, tag_mode, "date-posted-asc",
+                                     license_ids, user_id)
+        if date_field == "taken":
+            to_kwargs, floor = _taken_window, _TAKEN_EPOCH
+        elif date_field == "upload":
+            to_kwargs, floor = _upload_window, _FLICKR_EPOCH
+        else:
+            raise ValueError(f"Unknown date_field {date_field!r}")
+        lo = int(min_date) if min_date is not None else floor
+        hi = int(max_date) if max_date is not None else int(time.time())
+
+        shards = []
+        # Without max_date the window ends now, which differs on every
+        # run; a resumed search keeps the end it was planned with
+        stream = PhotoStream(self._iter_shards(
+            kwargs, (lo, hi), to_kwargs, _bisect_window, _describe_window,
+            count, shard_workers, use_cache, shards, state_path,
+            state_root=(lo, hi if max_date is not None else None)))
+        stream.shards = shards
+        return stream
+
+    def search_photos_sharded(self, text="", tags="", tag_mode="any",
+                              license_ids="", user_id="", count=None,
+                              date_field="upload", min_date=None,
+                              max_date=None,
+                              shard_workers=DEFAULT_SHARD_WORKERS,
+                              state_path=None, use_cache=True):
+        """Search Flickr without the 4000-result cap by splitting on dates.
+
+        The date range is bisected until every window holds at most
+        SEARCH_RESULT_CAP results, then the windows are fetched
+        ``shard_workers`` at a time and merged without duplicates. Results
+        come back grouped by window rather than in a global sort order.
+
+        Args:
+            text: Free-text search query.
+            tags: Comma-separated tags.
+            tag_mode: 'any' or 'all'.
+            license_ids: Comma-separated license IDs.
+            user_id: Optional user NSID to restrict results to.
+            count: Stop after this many photos, or None for all of them.
+            date_field: 'upload' or 'taken', the date the range is split on.
+            min_date: Start of the range as a Unix time (default Feb 2004
+                for upload dates, 1800 for taken dates).
+            max_date: End of the range as a Unix time (default now).
+            shard_workers: Windows counted and fetched concurrently.
+            state_path: Optional file in which to keep a ShardQueue, so
+                running the same search again resumes after the last
+                finished window.
+            use_cache: False to bypass the API cache for this call.
+
+        Returns:
+            List of Photo records.
+        """
+        stream = self.iter_search_photos_sharded(
+            text=text, tags=tags, tag_mode=tag_mode,
+            license_ids=license_ids, user_id=user_id, count=count,
+            date_field=date_field, min_date=min_date, max_date=max_date,
+            shard_workers=shard_workers, state_path=state_path,
+            use_cache=use_cache,
+        )
+        photos = list(stream)
+        self._log(f"Found {len(photos)} photos from search "
+                  f"in {len(stream.shards)} shards.")
+        return photos
+
+    def iter_search_photos_geo(self, bbox, text="", tags="", tag_mode="any",
+                               license_ids="", user_id="", count=None,
+                               min_date=None, max_date=None,
+                               min_tile=DEFAULT_MIN_TILE,
+                               shard_workers=DEFAULT_SHARD_WORKERS,
+                               state_path=None, use_cache=True):
+        """Stream every geotagged result inside a bounding box.
+
+        Same arguments as search_photos_geo; returns a PhotoStream whose
+        ``shards`` lists each tile with its expected and fetched counts.
+        """
+        kwargs = self._search_kwargs(text, tags, tag_mode, "date-posted-asc",
+                                     license_ids, user_id)
+        # Flickr only searches the last 12 hours of uploads for a geo query
+        # without a date or text limit, so always give it an upload range
+        kwargs["min_upload_date"] = (int(min_date) if min_date is not None
+                                     else _FLICKR_EPOCH)
+        if max_date is not None:
+            kwargs["max_upload_date"] = int(max_date)
+
+        if isinstance(bbox, str):
+            bbox = [float(v) for v in bbox.split(",")]
+        root = tuple(float(v) for v in bbox)
+        if len(root) != 4 or root[0] >= root[2] or root[1] >= root[3]:
+            raise ValueError(
+                "bbox must be min_lon,min_lat,max_lon,max_lat")
+
+        shards = []
+        stream = PhotoStream(self._iter_shards(
+            kwargs, root, _bbox_kwargs, lambda t: _quarter_tile(t, min_tile),
+            _describe_tile, count, shard_workers, use_cache, shards,
+            state_path))
+        stream.shards = shards
+        return stream
+
+    def search_photos_geo(self, bbox, text="", tags="", tag_mode="any",
+                          license_ids="", user_id="", count=None,
+                          min_date=None, max_date=None,
+                          min_tile=DEFAULT_MIN_TILE,
+                          shard_workers=DEFAULT_SHARD_WORKERS,
+                          state_path=None, use_cache=True):
+        """Search a bounding box, tiling it to get past the 4000-result cap.
+
+        The box is split quad-tree style: any tile with more than
+        SEARCH_RESULT_CAP results is divided into four until it is under
+        the cap or ``min_tile`` degrees wide. Tiles are searched with
+        ``bbox`` ``shard_workers`` at a time, and photos on a shared
+        border are kept once.
+
+        Args:
+            bbox: (min_lon, min_lat, max_lon, max_lat), or the same as a
+                comma-separated string.
+            text: Free-text search query.
+            tags: Comma-separated tags.
+            tag_mode: 'any' or 'all'.
+            license_ids: Comma-separated license IDs.
+            user_id: Optional user NSID to restrict results to.
+            count: Stop after this many photos, or None for all of them.
+            min_date: Earliest upload as a Unix time (default Feb 2004).
+            max_date: Latest upload as a Unix time.
+            min_tile: Smallest tile width/height in degrees.
+            shard_workers: Tiles counted and fetched concurrently.
+            state_path: Optional file in which to keep a ShardQueue, so
+                running the same search again resumes with the tiles that
+                were not finished.
+            use_cache: False to bypass the API cache for this call.
+
+        Returns:
+            List of Photo records.
+        """
+        stream = self.iter_search_photos_geo(
+            bbox, text=text, tags=tags, tag_mode=tag_mode,
+            license_ids=license_ids, user_id=user_id, count=count,
+            min_date=min_date, max_date=max_date, min_tile=min_tile,
+            shard_workers=shard_workers, state_path=state_path,
+            use_cache=use_cache,
+        )
+        photos = list(stream)
+        self._log(f"Found {len(photos)} photos in "
+                  f"{len(stream.shards)} tiles.")
+        return photos
+
+    def _count_results(self, kwargs, use_cache):
+        """Number of results photos.search reports for a query."""
+        kwargs = {k: v for k, v in kwargs.items() if k != "extras"}
+        resp = self._api_call(self.flickr.photos.search, use_cache=use_cache,
+                              per_page=1, page=1, **kwargs)
+        return int(resp["photos"].get("total", 0) or 0)
+
+    def _plan_shards(self, kwargs, root, to_kwargs, split, describe,
+                     workers, use_cache):
+        """Split ``root`` until no part has more than SEARCH_RESULT_CAP results.
+
+        Args:
+            kwargs: photos.search arguments shared by every shard.
+            root: The region to cover, in whatever form split() takes.
+            to_kwargs: Maps a region to its extra search arguments.
+            split: Returns the sub-regions of a region, or None if it
+                cannot be split further.
+            describe: Short text naming a region for the log.
+            workers: Regions counted concurrently.
+            use_cache: Whether counts may come from the API cache.
+
+        Returns:
+            List of (region, expected result count), non-empty regions only.
+        """
+        shards = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            def count(region):
+                return self._count_results(
+                    dict(kwargs, **to_kwargs(region)), use_cache)
+
+            pending = {pool.submit(count, root): root}
+            while pending and not self._cancelled:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    region = pending.pop(future)
+                    total = future.result()
+                    parts = split(region) if total > SEARCH_RESULT_CAP else None
+                    if parts:
+                        for part in parts:
+                            pending[pool.submit(count, part)] = part
+                    elif total:
+                        if total > SEARCH_RESULT_CAP:
+                            self._log(f"  {describe(region)} cannot be split "
+                                      f"further; {total} results capped.")
+                        shards.append((region, total))
+            for future in pending:
+                future.cancel()
+        return shards
+
+    def _iter_shards(self, kwargs, root, to_kwargs, split, describe, count,
+                     workers, use_cache, report, state_path=None,
+                     state_root=None):
+        """Yield (batch, expected_total) for a search split into shards.
+
+        Each shard is listed in full on a worker thread; batches are
+        yielded as shards finish, minus photos an earlier shard returned.
+        A dict per finished shard is appended to ``report``. With a
+        ``state_path`` the plan and finished shards are kept in a
+        ShardQueue so an interrupted search resumes where it stopped;
+        the saved state belongs to the same kwargs and ``state_root``
+        (``root`` unless given), and a resumed search keeps its saved plan.
+        A search whose shards all finished is planned afresh, so a later
+        run sees photos added since.
+        """
+        state = None
+        if state_path:
+            state = ShardQueue(state_path, {
+                "kwargs": kwargs,
+                "root": root if state_root is None else state_root,
+            })
+        try:
+            shards = state.planned() if state else None
+            if shards is not None and not state.pending():
+                state.clear()
+                shards = None
+            if shards is None:
+                self._log("Planning search shards...")
+                shards = self._plan_shards(kwargs, root, to_kwargs, split,
+                                           describe, workers, use_cache)
+                if state and not self._cancelled:
+                    state.set_plan(shards)
+            expected = sum(total for _, total in shards)
+            if state:
+                todo = state.pending()
+                seen = state.seen_ids()
+                if len(todo) < len(shards):
+                    self._log(f"Resuming: {len(shards) - len(todo)} of "
+                              f"{len(shards)} shards already done.")
+                expected = max(0, expected - len(seen))
+            else:
+                todo = shards
+                seen = set()
+            if count:
+                expected = min(expected, count)
+            self._log(f"Searching {len(todo)} shards "
+                      f"(about {expected} photos)...")
+            yield from self._fetch_shards(
+                kwargs, todo, to_kwargs, describe, count, expected, seen,
+                workers, use_cache, report, state)
+        finally:
+            if state:
+                state.close()
+
+    def _fetch_shards(self, kwargs, shards, to_kwargs, describe, count,
+                      expected, seen, workers, use_cache, report, state):
+        def fetch(region):
+            stream = PhotoStream(self._iter_pages(
+                self.flickr.photos.search, "photos", None, describe(region),
+                page_workers=1, use_cache=use_cache,
+                **dict(kwargs, **to_kwargs(region))))
+            return list(stream)
+
+        yielded = 0
+        todo = iter(shards)
+        pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            pending = {}
+            while True:
+                while len(pending) < max(1, workers) and not self._cancelled:
+                    region, total = next(todo, (None, 0))
+                    if region is None:
+                        break
+                    pending[pool.submit(fetch, region)] = (region, total)
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    region, total = pending.pop(future)
+                    photos = future.result()
+                    batch = []
+                    for photo in photos:
+                        if photo.id not in seen:
+                            seen.add(photo.id)
+                            batch.append(photo)
+                    truncated = count and len(batch) > count - yielded
+                    if truncated:
+                        batch = batch[:count - yielded]
+                    yielded += len(batch)
+                    report.append({"shard": describe(region),
+                                   "expected": total,
+                                   "fetched": len(photos),
+                                   "new": len(batch)})
+                    self._log(f"  Shard {describe(region)}: {len(photos)} "
+                              f"photos ({len(batch)} new)")
+                    yield batch, max(expected, yielded)
+                    # The batch has been consumed; a partly used shard
+                    # stays pending so a resumed search lists it again
+                    if state and not truncated:
+                        state.mark_done(region, [p.id for p in photos])
+                    if (count and yielded >= count) or self._cancelled:
+                        return
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def resolve_user(self, username_or_url, use_cache=True):
         """Resolve a Flickr username or profile URL to a user NSID.
 
         Args:
             username_or_url: Either a plain username or a Flickr URL.
+            use_cache: False to bypass the API cache for this call.
 
         Returns:
             Tuple of (nsid, username).
@@ -233,7 +1150,8 @@ class FlickrDownloader:
             if not url.startswith("http"):
                 url = "https://" + url
             try:
-                resp = self._api_call(self.flickr.urls.lookupUser, url=url)
+                resp = self._api_call(self.flickr.urls.lookupUser,
+                                      use_cache=use_cache, url=url)
                 nsid = resp["user"]["id"]
                 uname = resp["user"]["username"]["_content"]
                 self._log(f"Resolved URL to user: {uname} ({nsid})")
@@ -244,7 +1162,8 @@ class FlickrDownloader:
         # Try as username
         try:
             resp = self._api_call(
-                self.flickr.people.findByUsername, username=username_or_url
+                self.flickr.people.findByUsername, use_cache=use_cache,
+                username=username_or_url,
             )
             nsid = resp["user"]["nsid"]
             uname = resp["user"]["username"]["_content"]
@@ -255,11 +1174,12 @@ class FlickrDownloader:
                 f"Could not find user '{username_or_url}': {e}"
             ) from e
 
-    def fetch_user_albums(self, user_nsid):
+    def fetch_user_albums(self, user_nsid, use_cache=True):
         """Fetch all albums/photosets for a user.
 
         Args:
             user_nsid: The user's NSID.
+            use_cache: False to bypass the API cache for this call.
 
         Returns:
             List of album dicts with 'id' and 'title' keys.
@@ -271,6 +1191,7 @@ class FlickrDownloader:
                 break
             resp = self._api_call(
                 self.flickr.photosets.getList,
+                use_cache=use_cache,
                 user_id=user_nsid,
                 per_page=500,
                 page=page,
@@ -289,267 +1210,946 @@ class FlickrDownloader:
         self._log(f"Found {len(albums)} albums for user.")
         return albums
 
-    def fetch_user_photos(self, user_nsid, count):
+    def iter_user_photos(self, user_nsid, count, use_cache=True):
+        """Stream a user's public photos page by page.
+
+        Same arguments as fetch_user_photos; returns a PhotoStream.
+        """
+        return PhotoStream(self._iter_pages(
+            self.flickr.people.getPublicPhotos, "photos", count,
+            "user photos", use_cache=use_cache, user_id=user_nsid,
+            extras=self.extras,
+        ))
+
+    def fetch_user_photos(self, user_nsid, count, use_cache=True):
         """Fetch public photos from a user's photostream.
 
         Args:
             user_nsid: The user's NSID.
             count: Number of photos to fetch.
+            use_cache: False to bypass the API cache for this call.
 
         Returns:
-            List of photo dicts with URL extras.
+            List of Photo records.
         """
-        photos = []
-        per_page = min(count, 500)
-        total_pages = (count + per_page - 1) // per_page
-
-        for page in range(1, total_pages + 1):
-            if self._cancelled:
-                break
-            self._log(f"Fetching user photos page {page}/{total_pages}...")
-            resp = self._api_call(
-                self.flickr.people.getPublicPhotos,
-                user_id=user_nsid,
-                extras=_EXTRAS,
-                per_page=per_page,
-                page=page,
-            )
-            batch = resp["photos"]["photo"]
-            if not batch:
-                break
-            photos.extend(batch)
-            if page >= int(resp["photos"]["pages"]):
-                break
-
-        photos = photos[:count]
+        photos = list(self.iter_user_photos(user_nsid, count, use_cache))
         self._log(f"Found {len(photos)} photos in user's photostream.")
         return photos
 
-    def fetch_album_photos(self, user_nsid, photoset_id):
+    def iter_album_photos(self, user_nsid, photoset_id, use_cache=True):
+        """Stream every photo in an album page by page.
+
+        Same arguments as fetch_album_photos; returns a PhotoStream.
+        """
+        return PhotoStream(self._iter_pages(
+            self.flickr.photosets.getPhotos, "photoset", None,
+            "album photos", use_cache=use_cache, user_id=user_nsid,
+            photoset_id=photoset_id, extras=self.extras,
+        ))
+
+    def fetch_album_photos(self, user_nsid, photoset_id, use_cache=True):
         """Fetch all photos from a specific album/photoset.
 
         Args:
             user_nsid: The album owner's NSID.
             photoset_id: The photoset/album ID.
+            use_cache: False to bypass the API cache for this call.
 
         Returns:
-            List of photo dicts with URL extras.
+            List of Photo records.
         """
-        photos = []
-        page = 1
-        while True:
-            if self._cancelled:
-                break
-            self._log(f"Fetching album photos page {page}...")
-            resp = self._api_call(
-                self.flickr.photosets.getPhotos,
-                user_id=user_nsid,
-                photoset_id=photoset_id,
-                extras=_EXTRAS,
-                per_page=500,
-                page=page,
-            )
-            batch = resp["photoset"]["photo"]
-            if not batch:
-                break
-            photos.extend(batch)
-            if page >= int(resp["photoset"]["pages"]):
-                break
-            page += 1
-
+        photos = list(self.iter_album_photos(
+            user_nsid, photoset_id, use_cache))
         self._log(f"Found {len(photos)} photos in album.")
         return photos
 
-    # --- Download engine ---
+    # --- Incremental sync ---
 
-    def _download_with_retry(self, url, max_retries=5):
-        """Download a URL with retry and exponential backoff on 429 errors."""
-        for attempt in range(max_retries):
-            if self._cancelled:
-                raise CancelledError("Operation cancelled")
-            resp = requests.get(url, timeout=30, stream=True)
-            if resp.status_code == 429:
-                # Respect Retry-After header, otherwise use exponential backoff
-                retry_after = resp.headers.get("Retry-After")
-                if retry_after:
-                    wait = int(retry_after)
-                else:
-                    wait = 2 ** attempt  # 1, 2, 4, 8, 16 seconds
-                if attempt < max_retries - 1:
-                    self._log(f"    Rate limited (429). Waiting {wait}s before retry...")
-                    time.sleep(wait)
+    def sync_user_photos(self, user_nsid, download_dir, size_key="url_l",
+                         check_updates=False, **options):
+        """Download the photos a user has uploaded since the last sync.
+
+        The first sync lists the whole photostream. Afterwards the newest
+        upload time below which every photo is on disk is kept in the
+        directory's manifest, and later syncs only list uploads from then on
+        via photos.search, so an unchanged account costs one API call.
+
+        Only new uploads are found that way: Flickr cannot list photos by
+        update time without the owner's authorization. With
+        ``check_updates`` the whole photostream is listed instead (one call
+        per 500 photos), and photos whose lastupdate is later than the time
+        the manifest recorded them, such as replaced images or edited
+        titles, are downloaded again over their old files.
+
+        Args:
+            user_nsid: The user's NSID.
+            download_dir: Destination directory; it keeps the sync state.
+            size_key: URL extras key for desired size.
+            check_updates: Also download photos changed since the last
+                sync again.
+            **options: Other download_photos arguments.
+
+        Returns:
+            Tuple of (downloaded_count, skipped_count, failed_count).
+        """
+        source = f"user:{user_nsid}:{size_key}"
+        mark = self._sync_mark(download_dir, source)
+        since = mark["uploaded"] if mark else None
+        last_update = mark["last_update"] if mark else None
+        full = check_updates or not since
+        extras = _add_extras(self.extras, _SYNC_EXTRAS)
+        if not full:
+            self._log(f"Listing uploads since "
+                      f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(since))}...")
+            photos = list(PhotoStream(self._iter_pages(
+                self.flickr.photos.search, "photos", None, "new uploads",
+                use_cache=False, user_id=user_nsid, min_upload_date=since,
+                sort="date-posted-asc", extras=extras,
+            )))
+        else:
+            photos = list(PhotoStream(self._iter_pages(
+                self.flickr.people.getPublicPhotos, "photos", None,
+                "user photos", use_cache=False, user_id=user_nsid,
+                extras=extras,
+            )))
+
+        with DownloadManifest(download_dir) as manifest:
+            # Changed photos not on disk are simply downloaded as new ones
+            old_paths = {}
+            if check_updates:
+                for photo in photos:
+                    fetched = manifest.downloaded_at(photo.id, size_key)
+                    if fetched is not None and photo.last_update > fetched:
+                        old_paths[photo.id] = manifest.lookup(
+                            photo.id, size_key)
+            todo = [p for p in photos if p.id in old_paths
+                    or manifest.lookup(p.id, size_key) is None]
+        self._log(f"Found {len(todo) - len(old_paths)} new photos in "
+                  f"user's photostream"
+                  + (f", {len(old_paths)} updated." if old_paths else "."))
+
+        started = time.time()
+        result = self._sync_download(todo, download_dir, size_key,
+                                     dict(options, replace=set(old_paths)))
+
+        with DownloadManifest(download_dir) as manifest:
+            uploaded = since
+            for photo in sorted(photos, key=_upload_time):
+                if manifest.lookup(photo.id, size_key) is None:
+                    break
+                uploaded = max(uploaded or 0, _upload_time(photo)) or None
+            if full:
+                last_update = max([last_update or 0]
+                                  + [p.last_update for p in photos]) or None
+            for photo_id, old in old_paths.items():
+                # A replacement that failed keeps its old record and time,
+                # so the next check_updates sync tries it again
+                if (manifest.downloaded_at(photo_id, size_key) or 0) \
+                        < started:
                     continue
-            resp.raise_for_status()
-            return resp
-        # Should not reach here, but just in case
-        resp.raise_for_status()
-        return resp
+                new_path = manifest.lookup(photo_id, size_key)
+                # A changed title can give the photo a new filename
+                if new_path not in (None, old) and os.path.exists(old):
+                    os.remove(old)
+            manifest.save_sync_mark(source, uploaded=uploaded,
+                                    last_update=last_update)
+        return result
+
+    def sync_album_photos(self, user_nsid, photoset_id, download_dir,
+                          size_key="url_l", **options):
+        """Download the photos added to an album since the last sync.
+
+        An album whose date_update has not moved is not listed at all.
+        Otherwise it is listed and compared with the set of photo ids
+        already downloaded, and only the new ones are fetched.
 
-    def get_photo_url(self, photo, size_key):
-        """Get the download URL for a photo at the requested size.
+        Args:
+            user_nsid: The album owner's NSID.
+            photoset_id: The photoset/album ID.
+            download_dir: Destination directory; it keeps the sync state.
+            size_key: URL extras key for desired size.
+            **options: Other download_photos arguments.
+
+        Returns:
+            Tuple of (downloaded_count, skipped_count, failed_count).
+        """
+        source = f"set:{photoset_id}:{size_key}"
+        mark = self._sync_mark(download_dir, source)
+        info = self._api_call(
+            self.flickr.photosets.getInfo, use_cache=False,
+            photoset_id=photoset_id, user_id=user_nsid)["photoset"]
+        set_update = int(info.get("date_update") or 0)
+        if mark and mark["set_update"] == set_update:
+            self._log("Album unchanged since the last sync.")
+            return 0, 0, 0
+
+        listed = list(self.iter_album_photos(
+            user_nsid, photoset_id, use_cache=False))
+        known = mark["photo_ids"] if mark else set()
+        photos = [p for p in listed if p.id not in known]
+        removed = len(known - {p.id for p in listed})
+        self._log(f"Found {len(photos)} new photos in album"
+                  + (f", {removed} removed." if removed else "."))
+
+        result = self._sync_download(photos, download_dir, size_key, options)
+
+        with DownloadManifest(download_dir) as manifest:
+            present = {p.id for p in listed
+                       if manifest.lookup(p.id, size_key) is not None}
+            # Until every photo is on disk the album is listed again next time
+            complete = len(present) == len(listed)
+            manifest.save_sync_mark(
+                source, set_update=set_update if complete else None,
+                photo_ids=present)
+        return result
+
+    def _sync_mark(self, download_dir, source):
+        os.makedirs(download_dir, exist_ok=True)
+        with DownloadManifest(download_dir) as manifest:
+            return manifest.sync_mark(source)
+
+    def _sync_download(self, photos, download_dir, size_key, options):
+        if not photos:
+            return 0, 0, 0
+        # Sync state is only as good as the manifest it is checked against
+        options = dict(options, use_manifest=True)
+        return self.download_photos(photos, download_dir, size_key=size_key,
+                                    **options)
+
+    # --- Download engine ---
+
+    def _download_with_retry(self, url, headers=None, attempt=0,
+                             defer=False, started=None):
+        """Open a download, retrying under the retry policy.
+
+        429s, 5xx replies, refused connections and timeouts are retried;
+        other errors are raised at once. A 416 reply to a ranged request
+        is returned rather than raised so the caller can decide whether
+        its partial file is already complete.
+
+        ``attempt`` counts earlier failed tries, such as those of a photo
+        that was deferred, and ``started`` is the monotonic time of the
+        first. With ``defer`` a retryable failure raises _Deferred with
+        the policy's wait instead of sleeping.
 
-        Falls back through smaller sizes, then to getSizes API.
+        Returns:
+            Tuple of (response, failed tries so far including ``attempt``).
+        """
+        if started is None:
+            started = time.monotonic()
+        while True:
+            self._acquire_token()
+            try:
+                resp = http_pool.get(url, timeout=30, stream=True,
+                                     headers=headers)
+            except requests.RequestException as e:
+                wait = self._retry_wait(attempt, started, defer, error=e)
+                if wait is None:
+                    raise
+            else:
+                status = resp.status_code
+                if status < 400 or (status == 416 and headers):
+                    self.rate_limiter.success()
+                    self.retries.success()
+                    return resp, attempt
+                with resp:
+                    wait = self._retry_wait(attempt, started, defer,
+                                            status=status,
+                                            headers=resp.headers)
+                    if wait is None:
+                        resp.raise_for_status()
+            self._backoff_sleep(wait)
+            attempt += 1
+
+    def _retry_wait(self, attempt, started, defer, error=None, status=None,
+                    headers=None):
+        """Apply the retry policy to a download request that failed.
+
+        Shared by both download engines. A 429 slows every request using
+        the rate limiter, and pauses them all while a Retry-After sent by
+        the server lasts; the backoff itself only delays this photo.
+
+        Args:
+            attempt: Earlier failed tries of this download.
+            started: time.monotonic() of its first try.
+            defer: Raise _Deferred instead of returning a wait.
+            error: The exception raised, if any.
+            status: The HTTP status of the reply, if there was one.
+            headers: The reply's headers, for Retry-After.
+
+        Returns:
+            Seconds to wait before retrying, or None to give up.
         """
-        # Try requested size first
-        if size_key in photo and photo[size_key]:
-            return photo[size_key]
+        retry_after = (_parse_retry_after(headers.get("Retry-After"))
+                       if headers is not None else None)
+        kind, wait = self.retries.backoff(
+            error, status, attempt=attempt, started=started,
+            retry_after=retry_after)
+        if kind == "throttle":
+            self.rate_limiter.throttled(retry_after)
+        if wait is None:
+            return None
+        reason = f"HTTP {status}" if status is not None else str(error)
+        if defer:
+            raise _Deferred(reason, wait)
+        self._log(f"    {reason}. Retrying in {wait:.1f}s...")
+        return wait
 
-        # Fall back through sizes largest to smallest
-        fallback_order = [
-            "url_o", "url_h", "url_l", "url_c", "url_z",
-            "url_m", "url_n", "url_s", "url_t", "url_sq",
-        ]
-        for key in fallback_order:
-            if key in photo and photo[key]:
-                return photo[key]
+    def get_photo_url(self, photo, size_key):
+        """Get the download URL for a photo at the requested size.
 
-        # Last resort: call getSizes API
+        Chooses from the photo's url_* extras, falling back to the
+        getSizes API (cached) when none of them is usable. ``photo`` may be
+        a Photo or a raw photo dict from a list response.
+        """
+        if isinstance(photo, dict):
+            photo = Photo.from_api(photo)
+        url = self._url_from_extras(photo, size_key)
+        if url:
+            return url
+        return self._url_from_sizes(photo, size_key)
+
+    def _url_from_sizes(self, photo, size_key):
+        """Pick a URL from photos.getSizes, which lists every size."""
         try:
             resp = self._api_call(
-                self.flickr.photos.getSizes, photo_id=photo["id"]
+                self.flickr.photos.getSizes, photo_id=photo.id
             )
-            sizes = resp["sizes"]["size"]
-            if sizes:
-                # Return the largest available
-                return sizes[-1]["source"]
+            sizes = [(_SIZE_LABELS.get(size["label"]), size["source"],
+                      max(int(size.get("width") or 0),
+                          int(size.get("height") or 0)))
+                     for size in resp["sizes"]["size"]]
         except Exception:
-            pass
+            return None
+        # getSizes lists smallest first
+        return _pick_size(sizes[::-1], size_key)
 
-        return None
+    @staticmethod
+    def _url_from_extras(photo, size_key):
+        """Pick a URL from the photo's url_* extras without any API call."""
+        return _pick_size(photo.sizes(), size_key)
+
+    def _resolve_ahead(self, photos, run, workers=DEFAULT_SIZES_WORKERS):
+        """Yield photos, looking up getSizes URLs ahead of the downloads.
+
+        Photos whose extras give no usable URL have getSizes called for
+        them ``workers`` at a time, up to ``workers * 2`` photos ahead, and
+        are yielded once answered; the rest pass straight through. Answers
+        are left in run.urls for _photo_url.
+        """
+        pool = ThreadPoolExecutor(max_workers=workers)
+        waiting = deque()
+        try:
+            for photo in photos:
+                if isinstance(photo, dict):
+                    photo = Photo.from_api(photo)
+                if not self._needs_sizes(photo, run):
+                    yield photo
+                    continue
+                waiting.append((photo, pool.submit(
+                    self._url_from_sizes, photo, run.size_key)))
+                while waiting and (waiting[0][1].done()
+                                   or len(waiting) >= workers * 2):
+                    yield self._resolved(*waiting.popleft(), run)
+            while waiting:
+                yield self._resolved(*waiting.popleft(), run)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _needs_sizes(self, photo, run):
+        if self._url_from_extras(photo, run.size_key):
+            return False
+        if photo.id in run.replace:
+            return True
+        # Photos that will be skipped or linked need no URL at all
+        if run.manifest is not None and run.manifest.lookup(
+                photo.id, run.size_key) is not None:
+            return False
+        return run.store is None or run.store.lookup(
+            photo.id, run.size_key) is None
+
+    @staticmethod
+    def _resolved(photo, future, run):
+        run.urls[photo.id] = future.result()
+        return photo
+
+    def _photo_url(self, photo, run):
+        """URL for a photo at the run's size, using any prefetched answer."""
+        if photo.id in run.urls:
+            return run.urls.pop(photo.id)
+        return self.get_photo_url(photo, run.size_key)
 
     def download_photos(self, photos, download_dir, size_key="url_l",
-                        embed_metadata=True, filename_template="{title}_{id}"):
+                        embed_metadata=True, filename_template="{title}_{id}",
+                        max_workers=DEFAULT_MAX_WORKERS, max_per_host=None,
+                        use_manifest=True, content_store=None,
+                        embed_processes=DEFAULT_EMBED_PROCESSES,
+                        group_by=None, max_deferrals=DEFAULT_MAX_DEFERRALS,
+                        replace=()):
         """Download photos to a local directory.
 
+        Photos are downloaded by a pool of worker threads, with at most
+        ``max_per_host`` transfers open to any one ``*.staticflickr.com``
+        host at a time. Metadata is embedded by a separate stage so the
+        workers move on to the next transfer straight away.
+
         Args:
-            photos: List of photo dicts from fetch methods.
+            photos: List of Photo records from fetch methods (raw photo
+                dicts are accepted too), or any iterable of them such as a
+                PhotoStream from the iter_* methods, in which case
+                downloading starts while later pages are fetched.
             download_dir: Destination directory.
             size_key: URL extras key for desired size.
-            embed_metadata: Whether to write IPTC/XMP/EXIF metadata.
+            embed_metadata: Whether to write IPTC/XMP/EXIF metadata. "stream"
+                splices it into JPEGs as they download, so each file is
+                written once instead of being rewritten afterwards.
+                "sidecar" leaves every image exactly as served and writes
+                an .xmp file next to it instead, for any file type.
             filename_template: Template with {id}, {title}, {owner} placeholders.
+            max_workers: Number of photos downloaded in parallel.
+            max_per_host: Concurrent transfers allowed per image host;
+                defaults to max_workers. Nearly every photo is served by
+                live.staticflickr.com, so a lower value caps the whole
+                download at that many transfers.
+            use_manifest: Record downloads in a DownloadManifest in
+                download_dir and skip photos it already lists at this size,
+                whatever their filename.
+            content_store: Optional ContentStore (or directory path for
+                one). Downloaded files are kept there once and linked into
+                download_dir; photos it already holds at this size are
+                linked without any network request.
+            embed_processes: Worker processes that embed metadata; 0 embeds
+                on the download threads. The processes are spawned and
+                re-import the calling script, whose top-level code must
+                then sit under ``if __name__ == "__main__":``.
+            group_by: Optional photo field, such as 'explore_date', whose
+                value names a subfolder of download_dir for each photo.
+            max_deferrals: Times a throttled or failing photo is put off,
+                to be retried after its backoff while the other photos
+                continue, before it is retried inline. 0 retries inline.
+            replace: Ids of photos to download again even though the
+                manifest, content store or an existing file has them; the
+                new file replaces the old one.
 
         Returns:
             Tuple of (downloaded_count, skipped_count, failed_count).
+            Photos saved without their metadata count as downloaded and are
+            tallied in ``metadata_failures``; retries are counted in
+            ``retries``, and deferred photos in ``retry_summary``.
         """
-        os.makedirs(download_dir, exist_ok=True)
-        total = len(photos)
-        downloaded = 0
-        skipped = 0
-        failed = 0
+        run = _DownloadRun(download_dir, size_key, embed_metadata,
+                           filename_template, use_manifest, content_store,
+                           embed_processes, self._log, group_by,
+                           max_deferrals, replace)
+        try:
+            return self._download_all(photos, run, max_workers,
+                                      max_per_host or max_workers)
+        finally:
+            run.close()
+            self.metadata_failures = run.metadata_failures
+            self.retry_summary = run.retry_summary
+
+    def _download_all(self, photos, run, max_workers, max_per_host):
+        counts = {"downloaded": 0, "skipped": 0, "failed": 0}
+        completed = 0
+
+        hosts = _HostLimiter(max_per_host)
+        max_workers = max(1, int(max_workers))
+        max_pending = max_workers * 2
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = set()
+            queue = iter(enumerate(self._resolve_ahead(photos, run)))
+            exhausted = False
+            # Futures of deferred photos being retried, to their photo ids
+            retrying = {}
+
+            while pending or not exhausted or run.deferred_count():
+                # Keep a bounded number of photos queued ahead of the
+                # workers; deferred photos go first once they are due
+                while not self._cancelled and len(pending) < max_pending:
+                    item = run.pop_deferred()
+                    retry = item is not None
+                    if not retry:
+                        if exhausted:
+                            break
+                        try:
+                            item = next(queue)
+                        except (StopIteration, CancelledError):
+                            exhausted = True
+                            break
+                    i, photo = item
+                    total = _expected_total(photos, i + 1)
+                    future = pool.submit(
+                        self._download_one, photo, i, total, run, hosts)
+                    pending.add(future)
+                    if retry:
+                        retrying[future] = photo.id
+                if self._cancelled:
+                    exhausted = True
+                    run.drop_deferred()
+                if not pending:
+                    if run.deferred_count():
+                        # Only deferred photos are left
+                        self._await_deferred(run)
+                        continue
+                    break
 
-        for i, photo in enumerate(photos):
-            if self._cancelled:
-                self._log("Download cancelled.")
-                break
+                done, pending = wait(pending, timeout=run.deferred_delay(),
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    outcome = future.result()
+                    photo_id = retrying.pop(future, None)
+                    if isinstance(outcome, Future):
+                        # Handed over to the embedding stage
+                        pending.add(outcome)
+                        if photo_id is not None:
+                            retrying[outcome] = photo_id
+                        continue
+                    if outcome is None or outcome == "deferred":
+                        continue
+                    if photo_id is not None:
+                        run.settle(photo_id, outcome)
+                    counts[outcome] += 1
+                    completed += 1
+                    self._progress(completed,
+                                   _expected_total(photos, completed))
+
+        if self._cancelled:
+            self._log("Download cancelled.")
+        elif not hasattr(photos, "__len__"):
+            # A stream's advertised total can overshoot what it delivered
+            self._progress(completed, completed)
+
+        return self._report_totals(counts, run)
+
+    def _await_deferred(self, run):
+        """Wait until the next deferred photo is due, or cancellation."""
+        delay = run.deferred_delay() or 0
+        if delay >= 1:
+            self._log(f"Waiting {delay:.0f}s to retry "
+                      f"{run.deferred_count()} deferred photo(s)...")
+        try:
+            self._backoff_sleep(delay)
+        except CancelledError:
+            pass
 
-            photo_id = photo["id"]
-            title = photo.get("title", "") or ""
-            if isinstance(title, dict):
-                title = title.get("_content", "")
-            owner = photo.get("ownername", "") or photo.get("owner", "")
-
-            # Build filename
-            fname = filename_template.format(
-                id=photo_id,
-                title=title[:100] if title else "untitled",
-                owner=owner[:50] if owner else "unknown",
-            )
-            fname = self._sanitize_filename(fname)
-
-            url = self.get_photo_url(photo, size_key)
-            if not url:
-                self._log(f"  [{i+1}/{total}] No URL for photo {photo_id}, skipping.")
-                failed += 1
-                self._progress(i + 1, total)
-                continue
-
-            # Determine extension from URL
-            ext = self._get_extension(url)
-            filepath = os.path.join(download_dir, f"{fname}{ext}")
-
-            # Skip existing files
-            if os.path.exists(filepath):
-                self._log(f"  [{i+1}/{total}] Already exists: {fname}{ext}")
-                skipped += 1
-                self._progress(i + 1, total)
-                continue
-
-            # Download with retry on 429
-            try:
-                self._log(f"  [{i+1}/{total}] Downloading: {fname}{ext}")
-                resp = self._download_with_retry(url)
-                with open(filepath, "wb") as f:
-                    for chunk in resp.iter_content(chunk_size=8192):
-                        if self._cancelled:
-                            break
-                        f.write(chunk)
+    def _report_totals(self, counts, run):
+        retried = run.retry_summary
+        if retried["deferred"]:
+            self._log(f"Retry pass: {retried['deferred']} deferred, "
+                      f"{retried['recovered']} recovered, "
+                      f"{retried['failed']} still failed.")
+        downloaded = counts["downloaded"]
+        skipped = counts["skipped"]
+        failed = counts["failed"]
+        summary = (f"Download complete: {downloaded} downloaded, "
+                   f"{skipped} skipped, {failed} failed")
+        if run.metadata_failures:
+            summary += f", {run.metadata_failures} without metadata"
+        retries = self.retries.stats()
+        if retries["retried"] or retries["gave_up"]:
+            summary += (f" ({retries['retried']} retries, "
+                        f"{retries['gave_up']} given up)")
+        self._log(summary + ".")
+        return downloaded, skipped, failed
 
+    def _download_one(self, photo, i, total, run, hosts):
+        """Download a single photo on a worker thread.
+
+        Returns:
+            'downloaded', 'skipped' or 'failed', 'deferred' if it was put
+            off for a later retry, None if the photo was abandoned because
+            the operation was cancelled, or a Future for that outcome once
+            the file is queued for metadata embedding.
+        """
+        if self._cancelled:
+            return None
+        if isinstance(photo, dict):
+            photo = Photo.from_api(photo)
+        if self._in_manifest(photo, i, total, run):
+            return "skipped"
+        stored = self._from_store(photo, i, total, run)
+        if stored:
+            return stored
+
+        url = self._photo_url(photo, run)
+        target = self._claim_target(photo, url, i, total, run)
+        if isinstance(target, str):
+            return target
+        filepath, label, title, owner = target
+
+        # Download into a .part file, resuming any earlier attempt
+        try:
+            with hosts.slot(url):
                 if self._cancelled:
-                    # Clean up partial file
-                    try:
-                        os.remove(filepath)
-                    except OSError:
-                        pass
-                    self._log("Download cancelled.")
-                    break
+                    run.release(filepath)
+                    return None
+                self._log(f"  [{i+1}/{total}] Downloading: {label}")
+                deferrals, defer = run.deferrals(photo.id)
+                fetched = self._fetch_to_file(
+                    url, filepath,
+                    metadata=self._splice_fields(photo, filepath, title,
+                                                 owner, run),
+                    attempt=deferrals, defer=defer)
+
+            if fetched is None or self._cancelled:
+                # The .part file is kept so the next run can resume it
+                run.release(filepath)
+                return None
+
+            spliced = fetched[2]
+            if run.embedder is not None and not spliced and \
+                    self._wants_embedding(filepath, run):
+                return run.embedder.submit(
+                    self._finish_stage, photo, url, filepath, fetched,
+                    title, owner, run, f"[{i+1}/{total}]")
+            self._finish_download(photo, url, filepath, fetched,
+                                  title, owner, run)
+            return "downloaded"
+
+        except CancelledError:
+            run.release(filepath)
+            return None
+        except _Deferred as e:
+            run.release(filepath)
+            return self._defer(photo, i, total, run, e)
+        except Exception as e:
+            self._log(f"  [{i+1}/{total}] Failed: {e}")
+            run.release(filepath)
+            return "failed"
+
+    def _defer(self, photo, i, total, run, deferred):
+        """Put a photo off after a retryable failure; its .part is kept."""
+        run.defer(photo, i, deferred.wait)
+        self._log(f"  [{i+1}/{total}] {deferred}; retrying in "
+                  f"{deferred.wait:.0f}s, after other photos")
+        return "deferred"
+
+    def _finish_stage(self, photo, url, filepath, fetched, title, owner, run,
+                      position):
+        """_finish_download as run by the embedding stage."""
+        try:
+            self._finish_download(photo, url, filepath, fetched,
+                                  title, owner, run)
+            return "downloaded"
+        except Exception as e:
+            self._log(f"  {position} Failed: {e}")
+            run.release(filepath)
+            return "failed"
+
+    def _in_manifest(self, photo, i, total, run):
+        """Check the manifest before any network work for a photo."""
+        if run.manifest is None or photo.id in run.replace:
+            return False
+        existing = run.manifest.lookup(photo.id, run.size_key)
+        if existing is None:
+            return False
+        self._log(
+            f"  [{i+1}/{total}] Already downloaded: "
+            f"{os.path.basename(existing)}")
+        return True
 
-                # Embed metadata
-                if embed_metadata and ext.lower() in (".jpg", ".jpeg"):
-                    desc = photo.get("description", {})
-                    if isinstance(desc, dict):
-                        desc = desc.get("_content", "")
-                    tags_str = photo.get("tags", "")
-                    if isinstance(tags_str, dict):
-                        tags_str = tags_str.get("_content", "")
-                    tag_list = [t.strip() for t in tags_str.split() if t.strip()] if tags_str else []
-                    self._embed_metadata(filepath, title, desc, tag_list, owner)
+    def _from_store(self, photo, i, total, run):
+        """Satisfy a photo from the content store without any network call.
 
-                downloaded += 1
+        Returns:
+            The photo's outcome, or None if the store does not have it.
+        """
+        if run.store is None or photo.id in run.replace:
+            return None
+        stored = run.store.lookup(photo.id, run.size_key)
+        if stored is None:
+            return None
+        sha256, url = stored
+
+        target = self._claim_target(photo, url, i, total, run)
+        if isinstance(target, str):
+            return target
+        filepath, label, title, owner = target
+        try:
+            self._log(f"  [{i+1}/{total}] From store: {label}")
+            self._materialize(photo, url, filepath, sha256, title, owner, run)
+            return "downloaded"
+        except Exception as e:
+            self._log(f"  [{i+1}/{total}] Failed: {e}")
+            run.release(filepath)
+            return "failed"
 
-            except Exception as e:
-                self._log(f"  [{i+1}/{total}] Failed: {e}")
-                failed += 1
-                # Clean up partial file
-                if os.path.exists(filepath):
-                    try:
-                        os.remove(filepath)
-                    except OSError:
-                        pass
+    def _claim_target(self, photo, url, i, total, run):
+        """Work out where a photo goes and reserve that filename.
+
+        Returns:
+            Tuple of (filepath, display name, title, owner), or the
+            outcome 'skipped'/'failed' if there is nothing to download.
+        """
+        photo_id = photo.id
+        fname, title, owner = self._build_filename(
+            photo, run.filename_template)
+        if not url:
+            self._log(f"  [{i+1}/{total}] No URL for photo {photo_id}, skipping.")
+            return "failed"
+
+        # Determine extension from URL
+        ext = self._get_extension(url)
+        label = f"{fname}{ext}"
+        if run.group_by:
+            group = self._sanitize_filename(
+                str(photo.get(run.group_by) or "")) or "other"
+            os.makedirs(os.path.join(run.download_dir, group), exist_ok=True)
+            label = os.path.join(group, label)
+        filepath = os.path.join(run.download_dir, label)
+
+        # Skip existing files, including ones another worker is writing now
+        if not run.claim(filepath, replace=photo_id in run.replace):
+            self._log(f"  [{i+1}/{total}] Already exists: {label}")
+            if run.manifest is not None and os.path.exists(filepath):
+                # Adopt files from before the manifest existed
+                run.manifest.record(photo_id, run.size_key, url, filepath,
+                                    os.path.getsize(filepath))
+            return "skipped"
+        return filepath, label, title, owner
+
+    def _finish_download(self, photo, url, filepath, fetched, title, owner,
+                         run):
+        """Embed metadata into a finished .part file and publish it."""
+        part, sha256, spliced = fetched
+        if run.store is not None:
+            run.store.put(part, sha256, photo.id, run.size_key, url)
+            _remove_part(part)
+            self._materialize(photo, url, filepath, sha256, title, owner, run)
+            return
+
+        # Embed metadata before the file becomes visible
+        if not spliced and self._wants_embedding(filepath, run):
+            if self._embed_into(photo, part, filepath, title, owner, run):
+                # The manifest describes the file on disk
+                sha256 = _file_sha256(part)
+        nbytes = os.path.getsize(part)
+        _commit_part(part, filepath)
+        self._queue_sidecar(photo, filepath, title, owner, run)
+        if run.manifest is not None:
+            run.manifest.record(photo.id, run.size_key, url, filepath,
+                                nbytes, sha256)
+
+    def _materialize(self, photo, url, filepath, sha256, title, owner, run):
+        """Create filepath from a content store blob.
+
+        Plain files are hardlinked to the blob; files that get metadata
+        embedded are written as their own copy so the blob stays pristine.
+        """
+        part = filepath + PART_SUFFIX
+        _remove_part(part)
+        if self._wants_embedding(filepath, run):
+            run.store.copy_to(sha256, part)
+            if self._embed_into(photo, part, filepath, title, owner, run):
+                sha256 = _file_sha256(part)
+        else:
+            run.store.link_to(sha256, part)
+        nbytes = os.path.getsize(part)
+        _commit_part(part, filepath)
+        self._queue_sidecar(photo, filepath, title, owner, run)
+        if run.manifest is not None:
+            run.manifest.record(photo.id, run.size_key, url, filepath,
+                                nbytes, sha256)
+
+    def _embed_into(self, photo, part, filepath, title, owner, run):
+        """Embed metadata into a .part file, noting it if that fails.
+
+        Returns:
+            True if the metadata was written.
+        """
+        if self._embed_photo_metadata(photo, part, title, owner,
+                                      run.embedder):
+            return True
+        self._log(f"  Metadata not written: {os.path.basename(filepath)}")
+        run.metadata_failed()
+        return False
+
+    def _splice_fields(self, photo, filepath, title, owner, run):
+        """Metadata to write while downloading, for embed_metadata="stream".
+
+        Files bound for a content store are left pristine and embedded
+        afterwards like any other copy.
+        """
+        if run.embed_metadata != "stream" or run.store is not None \
+                or not self._wants_embedding(filepath, run):
+            return None
+        return self._photo_fields(photo, title, owner)
+
+    def _queue_sidecar(self, photo, filepath, title, owner, run):
+        """Hand an XMP sidecar for filepath to the background writer."""
+        if run.sidecars is None:
+            return
+        title, desc, tags, author = self._photo_fields(photo, title, owner)
+        packet = xmp_packet(
+            title, desc, tags, author,
+            date_taken=photo.date_taken,
+            rights=LICENSE_NAMES.get(photo.license, photo.license and
+                                     f"Flickr license {photo.license}"),
+            source=_photo_page_url(photo),
+        )
+        if packet:
+            run.sidecars.put(os.path.splitext(filepath)[0] + ".xmp", packet)
 
-            self._progress(i + 1, total)
+    @staticmethod
+    def _wants_embedding(filepath, run):
+        ext = os.path.splitext(filepath)[1]
+        return (run.embed_metadata in (True, "stream")
+                and ext.lower() in (".jpg", ".jpeg"))
 
-            # Rate limit: 1 second between downloads to avoid 429s
-            if i < total - 1 and not self._cancelled:
-                time.sleep(1.0)
+    def _fetch_to_file(self, url, filepath, max_resumes=3, metadata=None,
+                       attempt=0, defer=False):
+        """Stream a URL into ``filepath + '.part'``, resuming where it left off.
 
-        self._log(
-            f"Download complete: {downloaded} downloaded, "
-            f"{skipped} skipped, {failed} failed."
+        An existing .part file is continued with a Range request guarded
+        by If-Range, so a changed photo is fetched afresh. Connection drops
+        mid-transfer are resumed up to ``max_resumes`` times; every retry,
+        resumed or not, counts against the same retry policy attempts.
+        The bytes are hashed as they are written.
+
+        Args:
+            url: Image URL.
+            filepath: Final path; the transfer writes to its .part file.
+            max_resumes: Reconnects allowed after dropped connections.
+            metadata: Optional (title, description, tags, author) to splice
+                into a JPEG as it is written.
+            attempt: Earlier failed tries; see _download_with_retry.
+            defer: Raise _Deferred rather than wait out a retryable failure.
+
+        Returns:
+            Tuple of (path of the completed .part file, SHA-256 hex digest
+            of its contents, whether metadata was spliced in), or None if
+            cancelled.
+        """
+        part = filepath + PART_SUFFIX
+        hasher = _PartHasher(part)
+        started = time.monotonic()
+        resumes = 0
+        while True:
+            offset, meta = _read_part_meta(part, url)
+            headers = _range_headers(offset, meta)
+            # Failures to open the request were retried, or deferred, by
+            # the policy already; only a body cut off mid-way is resumed
+            resp, attempt = self._download_with_retry(
+                url, headers=headers, attempt=attempt, defer=defer,
+                started=started)
+            out = None
+            # Closing the response returns its connection to the pool
+            with resp:
+                if resp.status_code == 416:
+                    if meta.get("size") == offset:
+                        hasher.resume(offset + meta.get("shift", 0))
+                        return (part, hasher.hexdigest(),
+                                bool(meta.get("spliced")))
+                    _remove_part(part)
+                    continue
+                start = _response_offset(
+                    resp.status_code, resp.headers, offset)
+                size = _response_size(resp.status_code, resp.headers, start)
+                try:
+                    with _PartWriter(part, url, resp.headers, size, start,
+                                     meta, hasher, metadata) as out:
+                        for chunk in resp.iter_content(chunk_size=65536):
+                            if self._cancelled:
+                                return None
+                            out.write(chunk)
+                except (requests.ConnectionError, requests.Timeout,
+                        requests.exceptions.ChunkedEncodingError) as e:
+                    wait = self._resume_wait(e, out, attempt, started,
+                                             resumes, max_resumes, defer)
+                    if wait is None:
+                        raise
+                    if out is not None and out.written:
+                        resumes += 1
+                    attempt += 1
+                    self._backoff_sleep(wait)
+                    continue
+
+            if _part_complete(part, out.expected_size):
+                return part, hasher.hexdigest(), out.spliced
+            resumes += 1
+            if resumes > max_resumes:
+                raise IOError(
+                    f"Transfer incomplete after {resumes} attempts")
+
+    def _resume_wait(self, error, out, attempt, started, resumes,
+                     max_resumes, defer):
+        """Apply the retry policy to a transfer cut off by ``error``.
+
+        A body dropped after bytes reached the .part file is resumed
+        inline, up to ``max_resumes`` times; one dropped before any
+        arrived is a failed request like any other, deferred with
+        ``defer``. Shared by both download engines.
+
+        Returns:
+            Seconds to wait before trying again, or None to give up.
+        """
+        if out is None or not out.written:
+            return self._retry_wait(attempt, started, defer, error=error)
+        if resumes >= max_resumes:
+            return None
+        _kind, wait = self.retries.backoff(
+            error, attempt=attempt, started=started)
+        if wait is not None:
+            self._log(f"    Connection lost ({error}), "
+                      f"resuming in {wait:.1f}s...")
+        return wait
+
+    def _build_filename(self, photo, filename_template):
+        """Render the filename template for a photo.
+
+        Returns:
+            Tuple of (sanitized filename without extension, title, owner).
+        """
+        title = photo.title
+        owner = photo.author
+
+        fname = filename_template.format(
+            id=photo.id,
+            title=title[:100] if title else "untitled",
+            owner=owner[:50] if owner else "unknown",
         )
-        return downloaded, skipped, failed
+        return self._sanitize_filename(fname), title, owner
 
     # --- Metadata embedding ---
 
-    def _embed_metadata(self, filepath, title, description, tags, author):
+    def _embed_photo_metadata(self, photo, filepath, title, owner,
+                              embedder=None):
+        """Embed a photo's description and tags along with title/owner.
+
+        Returns:
+            False if metadata could not be written.
+        """
+        return self._embed_metadata(
+            filepath, *self._photo_fields(photo, title, owner), embedder)
+
+    @staticmethod
+    def _photo_fields(photo, title, owner):
+        """Return (title, description, tags, author) to embed for a photo."""
+        return title, photo.description, list(photo.tags), owner
+
+    def _embed_metadata(self, filepath, title, description, tags, author,
+                        embedder=None):
         """Embed metadata into a JPEG file.
 
         Uses pyexiv2 if available (IPTC + XMP + EXIF), otherwise piexif (EXIF only).
-        """
-        if _HAS_PYEXIV2:
-            try:
-                self._embed_pyexiv2(filepath, title, description, tags, author)
-                return
-            except Exception as e:
-                self._log(f"  pyexiv2 metadata failed: {e}")
+        With an embedder the work happens in one of its worker processes.
 
-        if _HAS_PIEXIF:
-            try:
-                self._embed_piexif(filepath, title, description, tags, author)
-                return
-            except Exception as e:
-                self._log(f"  piexif metadata failed: {e}")
+        Returns:
+            False if every available backend failed.
+        """
+        args = (filepath, title, description, tags, author)
+        if embedder is not None:
+            written, errors = embedder.run(*args)
+        else:
+            written, errors = _write_metadata(*args)
+        for msg in errors:
+            self._log(f"  {msg}")
+        return written or not errors
 
-    def _embed_pyexiv2(self, filepath, title, description, tags, author):
+    @staticmethod
+    def _embed_pyexiv2(filepath, title, description, tags, author):
         """Write IPTC, XMP, and EXIF metadata using pyexiv2."""
         with pyexiv2.Image(filepath) as img:
             # IPTC
@@ -587,7 +2187,8 @@ class FlickrDownloader:
             if exif_data:
                 img.modify_exif(exif_data)
 
-    def _embed_piexif(self, filepath, title, description, tags, author):
+    @staticmethod
+    def _embed_piexif(filepath, title, description, tags, author):
         """Write EXIF metadata using piexif (fallback)."""
         try:
             exif_dict = piexif.load(filepath)
@@ -638,6 +2239,561 @@ class FlickrDownloader:
         return ext.lower() if ext else ".jpg"
 
 
+def _write_metadata(filepath, title, description, tags, author):
+    """Embed metadata with the best available backend.
+
+    Module-level so it can run in an _EmbedStage worker process.
+
+    Returns:
+        Tuple of (written, error messages from backends that failed).
+    """
+    errors = []
+    if _HAS_PYEXIV2:
+        try:
+            FlickrDownloader._embed_pyexiv2(
+                filepath, title, description, tags, author)
+            return True, errors
+        except Exception as e:
+            errors.append(f"pyexiv2 metadata failed: {e}")
+
+    if _HAS_PIEXIF:
+        try:
+            FlickrDownloader._embed_piexif(
+                filepath, title, description, tags, author)
+            return True, errors
+        except Exception as e:
+            errors.append(f"piexif metadata failed: {e}")
+    return False, errors
+
+
+_embed_pool = None
+_embed_pool_lock = threading.Lock()
+
+
+def _get_embed_pool(processes):
+    """Process pool shared by every _EmbedStage in this process."""
+    global _embed_pool
+    with _embed_pool_lock:
+        if _embed_pool is None:
+            # Forking a threaded process (gunicorn --threads, download
+            # workers) can deadlock the child; start clean interpreters
+            _embed_pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context("spawn"))
+        return _embed_pool
+
+
+def _discard_embed_pool(pool):
+    """Drop a broken pool so the next _EmbedStage starts a fresh one."""
+    global _embed_pool
+    with _embed_pool_lock:
+        if _embed_pool is pool:
+            _embed_pool = None
+    pool.shutdown(wait=False)
+
+
+class _EmbedStage:
+    """Applies metadata in worker processes so downloads keep streaming.
+
+    pyexiv2 and piexif are CPU bound (piexif holds the GIL), so each JPEG is
+    handed to a process pool. submit() queues the finishing step of a
+    download on a small thread pool and blocks once ``processes * 4``
+    photos are waiting, which keeps memory and disk use bounded.
+    """
+
+    def __init__(self, processes):
+        self.processes = processes
+        self._threads = ThreadPoolExecutor(max_workers=processes * 2)
+        self._slots = threading.BoundedSemaphore(processes * 4)
+
+    def submit(self, fn, *args):
+        self._slots.acquire()
+        future = self._threads.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, *args):
+        """Embed metadata in a worker process; returns (written, errors)."""
+        try:
+            pool = _get_embed_pool(self.processes)
+            written, errors = pool.submit(_write_metadata, *args).result()
+        except BrokenProcessPool:
+            # A worker died; the next photo gets a fresh pool
+            _discard_embed_pool(pool)
+            written, errors = _write_metadata(*args)
+        except (OSError, RuntimeError):
+            # No usable worker processes here: embed on this thread
+            written, errors = _write_metadata(*args)
+        return written, errors
+
+    def close(self):
+        self._threads.shutdown(wait=True)
+
+
+class _SidecarWriter:
+    """Writes XMP sidecar files on a background thread.
+
+    Download workers hand finished packets to put() and move on; the
+    thread drains whatever has queued up and writes it as one batch. Each
+    file is written to a temporary name and renamed into place.
+    """
+
+    _BATCH = 64
+
+    def __init__(self, on_error):
+        self._queue = queue.Queue()
+        self._on_error = on_error
+        self._thread = threading.Thread(
+            target=self._run, name="xmp-sidecars", daemon=True)
+        self._thread.start()
+
+    def put(self, path, packet):
+        self._queue.put((path, packet))
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self._BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if item is None:
+                    return
+                self._write(*item)
+
+    def _write(self, path, packet):
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(packet)
+            os.replace(tmp, path)
+        except OSError as e:
+            self._on_error(path, e)
+
+    def close(self):
+        """Write everything queued so far and stop the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+def _photo_page_url(photo):
+    """Flickr page for a photo; the short flic.kr form if the owner is unknown."""
+    if photo.owner:
+        return f"https://www.flickr.com/photos/{photo.owner}/{photo.id}/"
+    alphabet = "123456789abcdefghijkmnopqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ"
+    num = int(photo.id)
+    short = ""
+    while num:
+        num, rem = divmod(num, 58)
+        short = alphabet[rem] + short
+    return f"https://flic.kr/p/{short}"
+
+
+def _bisect_window(window):
+    """Split a (start, end) Unix time window in two, or None at one second."""
+    lo, hi = window
+    if hi - lo < 1:
+        return None
+    mid = (lo + hi) // 2
+    return [(lo, mid), (mid + 1, hi)]
+
+
+def _upload_window(window):
+    return {"min_upload_date": window[0], "max_upload_date": window[1]}
+
+
+def _taken_window(window):
+    fmt = "%Y-%m-%d %H:%M:%S"
+    return {"min_taken_date": _utc(window[0]).strftime(fmt),
+            "max_taken_date": _utc(window[1]).strftime(fmt)}
+
+
+def _describe_window(window):
+    fmt = "%Y-%m-%d %H:%M"
+    return (f"{_utc(window[0]).strftime(fmt)} to "
+            f"{_utc(window[1]).strftime(fmt)}")
+
+
+def _utc(seconds):
+    # time.gmtime() rejects times before 1970 on Windows
+    return datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(
+        seconds=seconds)
+
+
+def _quarter_tile(tile, min_size):
+    """Split a (w, s, e, n) tile into four, or None once it is min_size."""
+    w, s, e, n = tile
+    if e - w < min_size * 2 and n - s < min_size * 2:
+        return None
+    mx = (w + e) / 2
+    my = (s + n) / 2
+    return [(w, s, mx, my), (mx, s, e, my), (w, my, mx, n), (mx, my, e, n)]
+
+
+def _bbox_kwargs(tile):
+    return {"bbox": ",".join(f"{v:.6f}" for v in tile)}
+
+
+def _describe_tile(tile):
+    return "bbox " + ",".join(f"{v:.4f}" for v in tile)
+
+
+def photo_extras(size_key="url_l", embed_metadata=True,
+                 filename_template="{title}_{id}", also=()):
+    """Return the extras a download with these options reads from a photo.
+
+    Args:
+        size_key: URL extras key for desired size. Smaller sizes down to
+            url_m are included as fallbacks for photos too small to have it.
+            For "max:N", every size that could be N pixels or less.
+        embed_metadata: The download_photos embed_metadata option.
+        filename_template: Template with {id}, {title}, {owner} placeholders.
+        also: Further extras to request.
+
+    Returns:
+        Comma-separated extras string for the Flickr API.
+    """
+    limit = _max_edge(size_key)
+    if limit is not None:
+        # Every size that could fit, the original included, plus url_m
+        extras = [key for key in _SIZE_ORDER
+                  if key == "url_o" or _NOMINAL_EDGES[key] <= limit
+                  or key == _ALWAYS_SERVED]
+    elif size_key in _SIZE_ORDER:
+        start = _SIZE_ORDER.index(size_key)
+        floor = max(start, _SIZE_ORDER.index(_ALWAYS_SERVED))
+        extras = list(_SIZE_ORDER[start:floor + 1])
+    else:
+        extras = [size_key]
+    if embed_metadata in _METADATA_EXTRAS:
+        extras.extend(_METADATA_EXTRAS[embed_metadata])
+    placeholders = {field for _text, field, _spec, _conv
+                    in string.Formatter().parse(filename_template) if field}
+    if "owner" in placeholders:
+        extras.append("owner_name")
+    return _add_extras("", [*extras, *also])
+
+
+def fetch_thumbnail(url, rate_limiter, timeout=10):
+    """Fetch a preview image through the shared rate limiter.
+
+    The request takes a limiter token like any download, and a 429 reply
+    slows the limiter down; it is not retried.
+
+    Args:
+        url: Image URL.
+        rate_limiter: The RateLimiter the job's other requests use.
+        timeout: Seconds to wait for the server.
+
+    Returns:
+        Tuple of (image bytes, Content-Type header or None).
+    """
+    rate_limiter.acquire()
+    with http_pool.get(url, timeout=timeout) as resp:
+        if resp.status_code == 429:
+            rate_limiter.throttled(
+                _parse_retry_after(resp.headers.get("Retry-After")))
+        resp.raise_for_status()
+        rate_limiter.success()
+        return resp.content, resp.headers.get("Content-Type")
+
+
+def _max_edge(size_key):
+    """Pixel limit of a "max:N" size key, or None for a url_* key."""
+    if size_key.startswith("max:"):
+        return int(size_key[4:])
+    return None
+
+
+def _pick_size(sizes, size_key):
+    """Choose a URL from [(url_key, url, longest edge)], largest first.
+
+    A url_* size_key takes that size, or else the largest listed. "max:N"
+    takes the largest size whose longest edge is at most N pixels, or the
+    smallest if none is that small. An edge of 0 (dimensions not listed)
+    is taken to be the size's nominal edge; an original of unknown size
+    is only chosen when it is the only size listed. Returns None if
+    nothing is listed.
+    """
+    if not sizes:
+        return None
+    limit = _max_edge(size_key)
+    if limit is None:
+        for key, url, _edge in sizes:
+            if key == size_key:
+                return url
+        return sizes[0][1]
+    known = [(edge or _NOMINAL_EDGES.get(key), url)
+             for key, url, edge in sizes]
+    known = [(edge, url) for edge, url in known if edge]
+    if not known:
+        return sizes[-1][1]
+    fitting = [pair for pair in known if pair[0] <= limit]
+    if fitting:
+        return max(fitting, key=lambda pair: pair[0])[1]
+    return min(known, key=lambda pair: pair[0])[1]
+
+
+def _add_extras(extras, names):
+    """Append names missing from a comma-separated extras string."""
+    merged = [e for e in extras.split(",") if e]
+    merged += [n for n in names if n not in merged]
+    return ",".join(merged)
+
+
+def _upload_time(photo):
+    return photo.date_upload
+
+
+def _expected_total(photos, seen=0):
+    """Best known size of a photo list or stream, never less than ``seen``."""
+    try:
+        return len(photos)
+    except TypeError:
+        return max(getattr(photos, "total", None) or 0, seen)
+
+
+def is_part_file(name):
+    """True for the .part files (and their metadata) of unfinished downloads."""
+    return name.endswith((PART_SUFFIX, PART_SUFFIX + _PART_META_SUFFIX))
+
+
+def _read_part_meta(part, url):
+    """Return (bytes received so far, saved validators) for a .part file.
+
+    The byte count is the offset in the served file, which differs from
+    the size on disk by ``meta["shift"]`` when metadata was spliced in. A
+    .part file that cannot be validated (no ETag or Last-Modified, saved
+    for another URL, or cut off mid-splice) is treated as absent.
+    """
+    try:
+        offset = os.path.getsize(part)
+        with open(part + _PART_META_SUFFIX, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return 0, {}
+    if meta.get("url") != url or not (meta.get("etag")
+                                      or meta.get("last_modified")):
+        return 0, {}
+    shift = meta.get("shift", 0)
+    if shift is None or offset < shift:
+        return 0, {}
+    return offset - shift, meta
+
+
+def _write_part_meta(part, url, headers, size, shift=0, spliced=False):
+    meta = {
+        "url": url,
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "size": size,
+        "shift": shift,
+        "spliced": spliced,
+    }
+    with open(part + _PART_META_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def _range_headers(offset, meta):
+    """Headers asking for the rest of a file, or None for a fresh GET."""
+    if not offset:
+        return None
+    return {
+        "Range": f"bytes={offset}-",
+        "If-Range": meta.get("etag") or meta["last_modified"],
+    }
+
+
+def _response_offset(status, headers, offset):
+    """Byte offset at which a response body starts."""
+    if status != 206:
+        # Full body: the file changed or the server ignored the Range
+        return 0
+    match = re.match(r"bytes (\d+)-", headers.get("Content-Range", ""))
+    if not match or int(match.group(1)) != offset:
+        raise IOError(
+            f"Unexpected Content-Range {headers.get('Content-Range')!r}")
+    return offset
+
+
+def _response_size(status, headers, start):
+    """Full size of the file being transferred, if the server says."""
+    if status == 206:
+        match = re.search(r"/(\d+)$", headers.get("Content-Range", ""))
+        return int(match.group(1)) if match else None
+    length = headers.get("Content-Length")
+    return start + int(length) if length and length.isdigit() else None
+
+
+def _part_complete(part, size):
+    """Check a finished transfer against the expected size.
+
+    Returns False if bytes are missing (resume), raises if there are too
+    many (the .part file is discarded).
+    """
+    written = os.path.getsize(part)
+    if size is None or written == size:
+        return True
+    if written > size:
+        _remove_part(part)
+        raise IOError(f"Received {written} bytes, expected {size}")
+    return False
+
+
+def _file_sha256(path):
+    """SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _commit_part(part, filepath):
+    """Atomically move a completed .part file to its final name."""
+    os.replace(part, filepath)
+    try:
+        os.remove(part + _PART_META_SUFFIX)
+    except OSError:
+        pass
+
+
+def _remove_part(part):
+    for path in (part, part + _PART_META_SUFFIX):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _PartWriter:
+    """Appends one response body to a .part file.
+
+    Keeps the running SHA-256 and the saved validators in step with the
+    bytes on disk. Given ``metadata`` (title, description, tags, author), a
+    transfer that starts from byte 0 goes through a JpegSplicer so the
+    metadata is written with the file; the size change is recorded so a
+    resumed transfer still asks the server for the right offset.
+    """
+
+    def __init__(self, part, url, headers, size, start, meta, hasher,
+                 metadata=None):
+        self._part = part
+        self._url = url
+        self._headers = headers
+        self._size = size
+        self._hasher = hasher
+        # Response bytes handed to this writer
+        self.written = 0
+        self.shift = meta.get("shift", 0) if start else 0
+        self.spliced = bool(meta.get("spliced")) if start else False
+        self._splicer = (JpegSplicer(*metadata)
+                         if metadata and not start else None)
+        self._save_meta()
+        hasher.resume(start + self.shift)
+        self._file = open(part, "ab" if start else "wb")
+
+    @property
+    def expected_size(self):
+        """Size the .part file should reach, if the server said."""
+        return None if self._size is None else self._size + self.shift
+
+    def write(self, chunk):
+        self.written += len(chunk)
+        if self._splicer is not None:
+            chunk = self._splicer.feed(chunk)
+            if self._splicer.done:
+                self._settle()
+        self._file.write(chunk)
+        self._hasher.update(chunk)
+
+    def _settle(self):
+        self.shift = self._splicer.shift
+        self.spliced = self._splicer.spliced
+        self._splicer = None
+        self._save_meta()
+
+    def _save_meta(self):
+        # Mid-splice the file cannot be mapped back to a server offset
+        shift = None if self._splicer is not None else self.shift
+        _write_part_meta(self._part, self._url, self._headers, self._size,
+                         shift, self.spliced)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None and self._splicer is not None:
+                tail = self._splicer.finish()
+                self._file.write(tail)
+                self._hasher.update(tail)
+                self._settle()
+        finally:
+            self._file.close()
+
+
+class _PartHasher:
+    """SHA-256 of a .part file, kept up to date as chunks are appended.
+
+    Bytes written in this process are hashed as they stream past; only a
+    .part file left by an earlier run is read back to seed the digest.
+    """
+
+    def __init__(self, part):
+        self._part = part
+        self._digest = hashlib.sha256()
+        self._hashed = 0
+
+    def resume(self, offset):
+        """Prepare to hash bytes appended at ``offset``."""
+        if offset == 0:
+            self._digest = hashlib.sha256()
+        elif offset != self._hashed:
+            self._digest = hashlib.sha256()
+            with open(self._part, "rb") as f:
+                remaining = offset
+                while remaining:
+                    chunk = f.read(min(remaining, 1 << 20))
+                    if not chunk:
+                        break
+                    self._digest.update(chunk)
+                    remaining -= len(chunk)
+        self._hashed = offset
+
+    def update(self, chunk):
+        self._digest.update(chunk)
+        self._hashed += len(chunk)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+def _parse_retry_after(value):
+    """Convert a Retry-After header (seconds or HTTP date) to seconds."""
+    if not value:
+        return None
+    try:
+        return max(0, int(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0, int(when.timestamp() - time.time()))
+
+
 class CancelledError(Exception):
     """Raised when an operation is cancelled."""
     pass
+
+
+class _Deferred(Exception):
+    """A retryable download failure left for the download loop to retry."""
+
+    def __init__(self, reason, wait):
+        super().__init__(reason)
+        self.wait = wait
@@ -2,6 +2,7 @@
 """GUI for the Flickr Photo Downloader application (PyQt6)."""
 
 import json
+import multiprocessing
 import os
 import sys
 from datetime import datetime, timedelta
@@ -17,7 +18,6 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont, QPixmap, QImage, QIcon
 
-import requests
 from dotenv import load_dotenv
 from PIL import Image
 
@@ -48,9 +48,17 @@ def get_base_path():
 
 sys.path.insert(0, get_base_path())
 import flickr_downloader as core
+from api_cache import ApiCache
 
 SETTINGS_FILE = os.path.join(get_base_path(), "settings.json")
 
+# Request budget shared by all worker threads
+RATE_LIMITER = core.RateLimiter()
+# How API calls and downloads are retried, for every worker
+RETRY_POLICY = core.RetryPolicy()
+# Flickr API responses cached between runs, shared by all workers
+API_CACHE = ApiCache(os.path.join(get_base_path(), "api_cache"))
+
 STYLESHEET = """
 QMainWindow, QWidget {
     background-color: #f8f9fa;
@@ -247,7 +255,9 @@ class LookupWorker(QThread):
 
     def run(self):
         try:
-            dl = core.FlickrDownloader(self.api_key, self.api_secret)
+            dl = core.FlickrDownloader(
+                self.api_key, self.api_secret, rate_limiter=RATE_LIMITER,
+                cache=API_CACHE, retry_policy=RETRY_POLICY)
             nsid, uname = dl.resolve_user(self.username)
             albums = dl.fetch_user_albums(nsid)
             self.finished.emit(uname, nsid, albums)
@@ -275,9 +285,9 @@ class PreviewWorker(QThread):
 
     def run(self):
         try:
-            import flickrapi
-            fl = flickrapi.FlickrAPI(self.api_key, self.api_secret,
-                                     format="parsed-json")
+            dl = core.FlickrDownloader(
+                self.api_key, self.api_secret, rate_limiter=RATE_LIMITER,
+                cache=API_CACHE, retry_policy=RETRY_POLICY)
             kwargs = {
                 "extras": "url_sq,owner_name,date_taken",
                 "per_page": PREVIEW_LIMIT,
@@ -295,8 +305,9 @@ class PreviewWorker(QThread):
             if self.user_id:
                 kwargs["user_id"] = self.user_id
 
-            resp = fl.photos.search(**kwargs)
-            photos = resp["photos"]["photo"]
+            resp = dl._api_call(dl.flickr.photos.search, use_cache=False,
+                                **kwargs)
+            photos = [core.Photo.from_api(p) for p in resp["photos"]["photo"]]
             total_available = int(resp["photos"]["total"])
 
             if not photos:
@@ -305,13 +316,12 @@ class PreviewWorker(QThread):
 
             loaded = 0
             for i, photo in enumerate(photos):
-                url = photo.get("url_sq")
+                url = photo.url_sq
                 if not url:
                     continue
                 try:
-                    r = requests.get(url, timeout=10)
-                    r.raise_for_status()
-                    img = Image.open(BytesIO(r.content))
+                    content, _type = core.fetch_thumbnail(url, RATE_LIMITER)
+                    img = Image.open(BytesIO(content))
                     img = img.resize((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)
                     img = img.convert("RGBA")
                     data = img.tobytes("raw", "RGBA")
@@ -349,27 +359,40 @@ class DownloadWorker(QThread):
     def run(self):
         try:
             self.downloader = core.FlickrDownloader(
-                self.api_key, self.api_secret)
+                self.api_key, self.api_secret, rate_limiter=RATE_LIMITER,
+                cache=API_CACHE, retry_policy=RETRY_POLICY)
             self.downloader.set_callbacks(
                 progress_cb=lambda c, t: self.progress_update.emit(c, t),
                 log_cb=lambda m: self.log_message.emit(m),
             )
 
             p = self.params
+            self.downloader.limit_extras(
+                p["size_key"], p["metadata"], p["filename"])
             photos = []
 
-            if self.tab_index == 0:
+            if self.tab_index == 0 and p.get("end_date"):
+                # Days are listed concurrently and filed in a folder per day
+                photos = self.downloader.iter_interestingness_range(
+                    p["date"], p["end_date"], p["count"])
+                if p.get("user_nsid"):
+                    nsid = p["user_nsid"]
+                    photos = (ph for ph in photos if ph.owner == nsid)
+
+            elif self.tab_index == 0:
                 photos = self.downloader.fetch_interestingness(
                     p["date"], p["count"])
                 if p.get("user_nsid"):
                     nsid = p["user_nsid"]
-                    photos = [ph for ph in photos
-                              if ph.get("owner") == nsid]
+                    photos = core.PhotoTable(photos).filter(
+                        owner=nsid).photos()
                     self.log_message.emit(
                         f"Filtered to {len(photos)} photos by user {nsid}.")
 
+            # Search and user sources are streamed so downloading starts
+            # while later pages are still being listed.
             elif self.tab_index == 1:
-                photos = self.downloader.search_photos(
+                photos = self.downloader.iter_search_photos(
                     text=p["text"], tags=p["tags"],
                     tag_mode=p["tag_mode"], sort=p["sort"],
                     license_ids=p["license_ids"],
@@ -378,12 +401,12 @@ class DownloadWorker(QThread):
 
             elif self.tab_index == 2:
                 if p["mode"] == "photostream":
-                    photos = self.downloader.fetch_user_photos(
+                    photos = self.downloader.iter_user_photos(
                         p["user_nsid"], p["count"])
                 else:
                     self.log_message.emit(
                         f"Downloading album: {p['album_title']}")
-                    photos = self.downloader.fetch_album_photos(
+                    photos = self.downloader.iter_album_photos(
                         p["user_nsid"], p["album_id"])
 
             if self.downloader.is_cancelled:
@@ -396,14 +419,20 @@ class DownloadWorker(QThread):
                 self.finished.emit(False)
                 return
 
-            self.log_message.emit(
-                f"Downloading {len(photos)} photos to: {p['folder']}")
-            self.downloader.download_photos(
+            if isinstance(photos, list):
+                self.log_message.emit(
+                    f"Downloading {len(photos)} photos to: {p['folder']}")
+            else:
+                self.log_message.emit(f"Downloading photos to: {p['folder']}")
+            result = self.downloader.download_photos(
                 photos, p["folder"],
                 size_key=p["size_key"],
                 embed_metadata=p["metadata"],
                 filename_template=p["filename"],
+                group_by="explore_date" if p.get("end_date") else None,
             )
+            if not any(result) and not self.downloader.is_cancelled:
+                self.log_message.emit("No photos found.")
             self.finished.emit(self.downloader.is_cancelled)
 
         except core.CancelledError:
@@ -591,15 +620,24 @@ class FlickrDownloaderApp(QMainWindow):
         hint.setStyleSheet("font-size: 8pt; color: #6e6e82;")
         layout.addWidget(hint, 0, 2)
 
-        layout.addWidget(QLabel("Count:"), 1, 0)
+        layout.addWidget(QLabel("To:"), 1, 0)
+        self.int_end_date_input = QLineEdit()
+        self.int_end_date_input.setPlaceholderText("optional")
+        self.int_end_date_input.setMaximumWidth(120)
+        layout.addWidget(self.int_end_date_input, 1, 1)
+        end_hint = QLabel("(last day of a range; one folder per day)")
+        end_hint.setStyleSheet("font-size: 8pt; color: #6e6e82;")
+        layout.addWidget(end_hint, 1, 2)
+
+        layout.addWidget(QLabel("Count:"), 2, 0)
         self.int_count_spin = QSpinBox()
         self.int_count_spin.setRange(1, 500)
         self.int_count_spin.setValue(500)
         self.int_count_spin.setMaximumWidth(100)
-        layout.addWidget(self.int_count_spin, 1, 1)
+        layout.addWidget(self.int_count_spin, 2, 1)
 
         layout.setColumnStretch(2, 1)
-        layout.setRowStretch(2, 1)
+        layout.setRowStretch(3, 1)
         self.tabs.addTab(tab, "Interestingness")
 
     def _build_search_tab(self):
@@ -805,9 +843,7 @@ class FlickrDownloaderApp(QMainWindow):
         img_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         cell_layout.addWidget(img_label)
 
-        title = photo.get("title", "") or ""
-        if isinstance(title, dict):
-            title = title.get("_content", "")
+        title = photo.title
         short = (title[:12] + "...") if len(title) > 15 else title
         title_label = QLabel(short)
         title_label.setFont(QFont("Segoe UI", 7))
@@ -815,8 +851,8 @@ class FlickrDownloaderApp(QMainWindow):
         title_label.setFixedWidth(THUMB_SIZE)
         cell_layout.addWidget(title_label)
 
-        owner = photo.get("ownername", "") or photo.get("owner", "")
-        date = photo.get("datetaken", "")
+        owner = photo.author
+        date = photo.date_taken
         tip = f"{title}\nBy: {owner}"
         if date:
             tip += f"\nDate: {date}"
@@ -918,6 +954,9 @@ class FlickrDownloaderApp(QMainWindow):
         if tab_index == 0:
             params["date"] = self.int_date_input.text().strip()
             params["count"] = self.int_count_spin.value()
+            end_date = self.int_end_date_input.text().strip()
+            if end_date and end_date != params["date"]:
+                params["end_date"] = end_date
 
         elif tab_index == 1:
             text = self.search_text_input.text().strip()
@@ -1036,6 +1075,7 @@ class FlickrDownloaderApp(QMainWindow):
             "metadata": self.metadata_check.isChecked(),
             "filename": self.filename_input.text(),
             "int_date": self.int_date_input.text(),
+            "int_end_date": self.int_end_date_input.text(),
             "int_count": self.int_count_spin.value(),
             "search_text": self.search_text_input.text(),
             "search_tags": self.search_tags_input.text(),
@@ -1075,6 +1115,8 @@ class FlickrDownloaderApp(QMainWindow):
             self.filename_input.setText(data["filename"])
         if "int_date" in data:
             self.int_date_input.setText(data["int_date"])
+        if "int_end_date" in data:
+            self.int_end_date_input.setText(data["int_end_date"])
         if "int_count" in data:
             self.int_count_spin.setValue(data["int_count"])
         if "search_text" in data:
@@ -1110,6 +1152,8 @@ class FlickrDownloaderApp(QMainWindow):
 
 
 def main():
+    # Metadata embedding uses worker processes, which frozen builds need
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     app.setStyleSheet(STYLESHEET)
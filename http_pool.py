@@ -0,0 +1,130 @@
+"""Process-wide pooled HTTP sessions for image downloads and thumbnails."""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Keep-alive connections kept open per host
+DEFAULT_POOL_MAXSIZE = 10
+# Number of distinct hosts whose pools are cached
+DEFAULT_POOL_CONNECTIONS = 32
+# Adapter-level retries. Downloads retry refused connections, 5xx replies
+# and 429s under their RetryPolicy, so the adapter makes one attempt and
+# retries are not multiplied during an outage.
+DEFAULT_MAX_RETRIES = 0
+
+
+class SessionPool:
+    """A lazily created ``requests.Session`` with keep-alive pools per host.
+
+    The session is shared by every thread in the process; the underlying
+    urllib3 connection pools are thread-safe, so concurrent downloads to
+    the same ``*.staticflickr.com`` host reuse warm TCP/TLS connections.
+    """
+
+    def __init__(self, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_factor=0.5):
+        self.pool_maxsize = pool_maxsize
+        self.pool_connections = pool_connections
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._session = None
+        self._adapters = []
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = self._build_session()
+            return self._session
+
+    def _build_session(self):
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=0,
+            status=0,
+            backoff_factor=self.backoff_factor,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False,
+        )
+        session = requests.Session()
+        self._adapters = []
+        for prefix in ("https://", "http://"):
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_maxsize,
+                max_retries=retry,
+            )
+            session.mount(prefix, adapter)
+            self._adapters.append(adapter)
+        return session
+
+    def get(self, url, **kwargs):
+        """Issue a GET through the shared session."""
+        return self.session.get(url, **kwargs)
+
+    def stats(self):
+        """Return connection reuse counts per host.
+
+        Returns:
+            Dict mapping host to a dict with 'connections' (sockets
+            opened), 'requests' (requests sent) and 'reused' (requests
+            served on an already open connection).
+        """
+        with self._lock:
+            adapters = list(self._adapters)
+        result = {}
+        for adapter in adapters:
+            pools = adapter.poolmanager.pools
+            with pools.lock:
+                entries = list(pools._container.items())
+            for key, pool in entries:
+                host = f"{key.key_scheme}://{key.key_host}"
+                entry = result.setdefault(
+                    host, {"connections": 0, "requests": 0, "reused": 0})
+                entry["connections"] += pool.num_connections
+                entry["requests"] += pool.num_requests
+                entry["reused"] += max(
+                    0, pool.num_requests - pool.num_connections)
+        return result
+
+    def close(self):
+        """Close every pooled connection; the next request starts afresh."""
+        with self._lock:
+            session, self._session = self._session, None
+            self._adapters = []
+        if session is not None:
+            session.close()
+
+
+_default_pool = SessionPool()
+_default_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide SessionPool."""
+    return _default_pool
+
+
+def configure(**kwargs):
+    """Replace the process-wide pool, e.g. ``configure(pool_maxsize=20)``."""
+    global _default_pool
+    with _default_lock:
+        old, _default_pool = _default_pool, SessionPool(**kwargs)
+    old.close()
+    return _default_pool
+
+
+def get(url, **kwargs):
+    """GET a URL through the process-wide pool."""
+    return _default_pool.get(url, **kwargs)
+
+
+def stats():
+    """Connection reuse counts for the process-wide pool."""
+    return _default_pool.stats()
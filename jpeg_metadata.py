@@ -0,0 +1,280 @@
+"""Build XMP packets and JPEG metadata segments, and splice them into a
+downloading file."""
+
+import struct
+from xml.sax.saxutils import escape
+
+# piexif, when installed, merges our fields into a camera's existing EXIF
+_HAS_PIEXIF = False
+try:
+    import piexif
+    _HAS_PIEXIF = True
+except ImportError:
+    pass
+
+_SOI = b"\xff\xd8"
+_EXIF_ID = b"Exif\x00\x00"
+_XMP_ID = b"http://ns.adobe.com/xap/1.0/\x00"
+_PHOTOSHOP_ID = b"Photoshop 3.0\x00"
+# Largest payload a JPEG segment can carry (length field includes itself)
+_MAX_SEGMENT = 0xFFFF - 2
+# Give up splicing if the header segments outgrow this much buffering
+_MAX_HEADER = 1024 * 1024
+
+# EXIF IFD0 tags
+_IMAGE_DESCRIPTION = 0x010E
+_ARTIST = 0x013B
+
+
+def exif_segment(title, description, tags, author):
+    """Return an APP1 Exif segment with ImageDescription and Artist."""
+    entries = {}
+    if title or description:
+        entries[_IMAGE_DESCRIPTION] = title or description
+    if author:
+        entries[_ARTIST] = author
+    if not entries:
+        return b""
+
+    # Little-endian TIFF header and a single IFD of ASCII values
+    count = len(entries)
+    data_offset = 8 + 2 + count * 12 + 4
+    ifd = struct.pack("<H", count)
+    data = b""
+    for tag in sorted(entries):
+        value = entries[tag].encode("utf-8") + b"\x00"
+        if len(value) <= 4:
+            ifd += struct.pack("<HHI", tag, 2, len(value)) + value.ljust(4, b"\x00")
+        else:
+            ifd += struct.pack("<HHII", tag, 2, len(value),
+                               data_offset + len(data))
+            data += value
+            if len(data) % 2:
+                data += b"\x00"
+    tiff = b"II*\x00" + struct.pack("<I", 8) + ifd + b"\x00\x00\x00\x00" + data
+    return _segment(0xE1, _EXIF_ID + tiff)
+
+
+def xmp_segment(title, description, tags, author):
+    """Return an APP1 XMP segment with Dublin Core title, description,
+    subject and creator."""
+    packet = xmp_packet(title, description, tags, author)
+    if not packet:
+        return b""
+    return _segment(0xE1, _XMP_ID + packet.encode("utf-8"))
+
+
+def xmp_packet(title, description, tags, author, date_taken=None,
+               rights=None, source=None):
+    """Return an XMP packet as a string, or '' if there is nothing to say.
+
+    Args:
+        title: dc:title.
+        description: dc:description.
+        tags: List of keywords for dc:subject.
+        author: dc:creator.
+        date_taken: photoshop:DateCreated, e.g. "2024-05-01 18:30:00".
+        rights: dc:rights, such as a license name.
+        source: dc:source, such as the photo's page URL.
+    """
+    props = []
+    if title:
+        props.append(_xmp_alt("dc:title", title))
+    if description:
+        props.append(_xmp_alt("dc:description", description))
+    if tags:
+        props.append(_xmp_list("dc:subject", "rdf:Bag", tags))
+    if author:
+        props.append(_xmp_list("dc:creator", "rdf:Seq", [author]))
+    if rights:
+        props.append(_xmp_alt("dc:rights", rights))
+    if source:
+        props.append(f"   <dc:source>{escape(source)}</dc:source>\n")
+    if date_taken:
+        props.append("   <photoshop:DateCreated>"
+                     f"{escape(date_taken.replace(' ', 'T'))}"
+                     "</photoshop:DateCreated>\n")
+    if not props:
+        return ""
+    return (
+        '<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
+        '<x:xmpmeta xmlns:x="adobe:ns:meta/">\n'
+        ' <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">\n'
+        '  <rdf:Description rdf:about=""\n'
+        '    xmlns:dc="http://purl.org/dc/elements/1.1/"\n'
+        '    xmlns:photoshop="http://ns.adobe.com/photoshop/1.0/">\n'
+        + "".join(props) +
+        '  </rdf:Description>\n'
+        ' </rdf:RDF>\n'
+        '</x:xmpmeta>\n'
+        '<?xpacket end="w"?>'
+    )
+
+
+def iptc_segment(title, description, tags, author):
+    """Return an APP13 Photoshop segment holding IPTC-IIM records."""
+    records = [(2, 0, b"\x00\x04")]
+    if title:
+        records.append((2, 5, _clip(title, 64)))
+    for tag in tags or ():
+        records.append((2, 25, _clip(tag, 64)))
+    if author:
+        records.append((2, 80, _clip(author, 32)))
+    if description:
+        records.append((2, 120, _clip(description, 2000)))
+    if len(records) == 1:
+        return b""
+
+    # 1:90 marks the values as UTF-8
+    iptc = b"\x1c\x01\x5a\x00\x03\x1b%G"
+    for record, dataset, value in records:
+        iptc += struct.pack(">BBBH", 0x1C, record, dataset, len(value)) + value
+    resource = b"8BIM" + struct.pack(">H", 0x0404) + b"\x00\x00"
+    resource += struct.pack(">I", len(iptc)) + iptc
+    if len(iptc) % 2:
+        resource += b"\x00"
+    return _segment(0xED, _PHOTOSHOP_ID + resource)
+
+
+class JpegSplicer:
+    """Inserts metadata segments into a JPEG as its bytes stream past.
+
+    Bytes are buffered only until the APPn/COM segments at the start of the
+    file have been seen; the rewritten header is then released and the rest
+    of the stream passes through untouched. Existing XMP and IPTC segments
+    are replaced. A camera's EXIF segment is kept, with the description and
+    artist merged in when piexif is available.
+
+    If the data is not a JPEG, or its header is unusually large, the bytes
+    are passed through unchanged and ``spliced`` stays False.
+    """
+
+    def __init__(self, title, description, tags, author):
+        self._fields = (title, description, tags, author)
+        self._buffer = bytearray()
+        self.done = False
+        self.spliced = False
+        # Bytes added to the file by splicing, once done
+        self.shift = 0
+
+    def feed(self, chunk):
+        """Take the next chunk of the download; return bytes to write."""
+        if self.done:
+            return chunk
+        self._buffer += chunk
+        return self._splice()
+
+    def finish(self):
+        """Return anything still buffered when the stream ends."""
+        if self.done:
+            return b""
+        return self._pass_through()
+
+    def _splice(self):
+        buf = self._buffer
+        if len(buf) < 2:
+            return b""
+        if buf[:2] != _SOI:
+            return self._pass_through()
+
+        segments = []
+        pos = 2
+        while True:
+            if len(buf) < pos + 4:
+                return self._wait()
+            if buf[pos] != 0xFF:
+                return self._pass_through()
+            marker = buf[pos + 1]
+            if not (0xE0 <= marker <= 0xEF or marker == 0xFE):
+                break
+            end = pos + 2 + struct.unpack(">H", buf[pos + 2:pos + 4])[0]
+            if len(buf) < end:
+                return self._wait()
+            segments.append((marker, bytes(buf[pos:end])))
+            pos = end
+
+        header = self._header(segments)
+        out = header + bytes(buf[pos:])
+        self.shift = len(header) - pos
+        self.spliced = True
+        self.done = True
+        self._buffer = bytearray()
+        return out
+
+    def _header(self, segments):
+        title, description, tags, author = self._fields
+        jfif = []
+        exif = None
+        others = []
+        for marker, seg in segments:
+            payload = seg[4:]
+            if marker == 0xE0 and not others and exif is None:
+                jfif.append(seg)
+            elif marker == 0xE1 and payload.startswith(_EXIF_ID):
+                if exif is None:
+                    exif = _merge_exif(seg, self._fields)
+            elif marker == 0xE1 and payload.startswith(_XMP_ID):
+                continue
+            elif marker == 0xED and payload.startswith(_PHOTOSHOP_ID):
+                continue
+            else:
+                others.append(seg)
+        if exif is None:
+            exif = exif_segment(title, description, tags, author)
+        # EXIF must follow SOI (or JFIF) directly
+        return b"".join([
+            _SOI, *jfif, exif,
+            xmp_segment(title, description, tags, author),
+            *others,
+            iptc_segment(title, description, tags, author),
+        ])
+
+    def _wait(self):
+        if len(self._buffer) > _MAX_HEADER:
+            return self._pass_through()
+        return b""
+
+    def _pass_through(self):
+        out = bytes(self._buffer)
+        self._buffer = bytearray()
+        self.done = True
+        return out
+
+
+def _merge_exif(seg, fields):
+    """Add our description and artist to an existing APP1 Exif segment."""
+    if not _HAS_PIEXIF:
+        return seg
+    title, description, _tags, author = fields
+    try:
+        exif_dict = piexif.load(seg[4:])
+        if title or description:
+            exif_dict["0th"][piexif.ImageIFD.ImageDescription] = (
+                (title or description).encode("utf-8"))
+        if author:
+            exif_dict["0th"][piexif.ImageIFD.Artist] = author.encode("utf-8")
+        return _segment(0xE1, piexif.dump(exif_dict))
+    except Exception:
+        return seg
+
+
+def _segment(marker, payload):
+    if len(payload) > _MAX_SEGMENT:
+        return b""
+    return bytes((0xFF, marker)) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def _clip(text, limit):
+    """Encode text as UTF-8, cut to at most ``limit`` bytes."""
+    data = text.encode("utf-8")[:limit]
+    return data.decode("utf-8", "ignore").encode("utf-8")
+
+
+def _xmp_alt(name, text):
+    return (f'   <{name}><rdf:Alt><rdf:li xml:lang="x-default">'
+            f'{escape(text)}</rdf:li></rdf:Alt></{name}>\n')
+
+
+def _xmp_list(name, kind, items):
+    lis = "".join(f"<rdf:li>{escape(item)}</rdf:li>" for item in items)
+    return f"   <{name}><{kind}>{lis}</{kind}></{name}>\n"
@@ -0,0 +1,131 @@
+"""Compact record for a photo from a Flickr list response."""
+
+import sys
+
+# url_* extras a Photo can carry, largest to smallest
+URL_KEYS = (
+    "url_o", "url_4k", "url_3k", "url_k", "url_h", "url_l", "url_c",
+    "url_z", "url_m", "url_n", "url_s", "url_t", "url_sq",
+)
+
+# Response keys holding each URL's width and height
+_DIM_KEYS = tuple((f"width_{key[4:]}", f"height_{key[4:]}") for key in URL_KEYS)
+
+# Response keys answered by Photo.get() and photo[...], by slot name
+_RESPONSE_KEYS = {
+    "id": "id",
+    "owner": "owner",
+    "ownername": "owner_name",
+    "title": "title",
+    "description": "description",
+    "tags": "tags",
+    "datetaken": "date_taken",
+    "license": "license",
+    "dateupload": "date_upload",
+    "lastupdate": "last_update",
+    "o_width": "o_width",
+    "o_height": "o_height",
+    "explore_date": "explore_date",
+    **{key: key for key in URL_KEYS},
+}
+
+_DEFAULTS = {
+    "owner": "", "owner_name": "", "title": "", "description": "",
+    "tags": (), "date_taken": "", "license": "", "date_upload": 0,
+    "last_update": 0, "o_width": 0, "o_height": 0, "explore_date": None,
+    "edges": (),
+    **{key: None for key in URL_KEYS},
+}
+
+
+class Photo:
+    """One photo from a list response, normalised once when it is parsed.
+
+    Only the fields the downloader reads are kept, in slots rather than
+    the nested dicts flickrapi returns: title and description are plain
+    strings, tags a tuple, upload times and original dimensions ints (0
+    when not listed), and url_* keys the request did not ask for are None.
+    Of the widths and heights listed with each URL only the longest edge
+    is kept, in ``edges``; other bookkeeping fields are dropped.
+
+    Photos also answer ``photo["id"]``, ``photo.get("ownername")`` and
+    ``"url_l" in photo`` with the response key names, so code written
+    against raw photo dicts keeps working (read-only).
+    """
+
+    __slots__ = ("id", *_DEFAULTS)
+
+    def __init__(self, id, **fields):
+        self.id = str(id)
+        for name, default in _DEFAULTS.items():
+            setattr(self, name, fields.pop(name, default))
+        if fields:
+            raise TypeError(f"Unknown Photo fields: {', '.join(fields)}")
+
+    @classmethod
+    def from_api(cls, data):
+        """Build a Photo from one entry of a parsed-json photo list."""
+        # Called for every listed photo, so slots are set directly
+        get = data.get
+        photo = cls.__new__(cls)
+        photo.id = str(data["id"])
+        # A photostream repeats one owner on every photo
+        photo.owner = sys.intern(get("owner", ""))
+        photo.owner_name = sys.intern(get("ownername", ""))
+        photo.title = _content(get("title"))
+        photo.description = _content(get("description"))
+        photo.tags = tuple(_content(get("tags")).split())
+        photo.date_taken = get("datetaken", "")
+        photo.license = sys.intern(str(get("license", "")))
+        photo.date_upload = int(get("dateupload") or 0)
+        photo.last_update = int(get("lastupdate") or 0)
+        # o_dims extra, or the url_o extra's own size
+        photo.o_width = int(get("o_width") or get("width_o") or 0)
+        photo.o_height = int(get("o_height") or get("height_o") or 0)
+        photo.explore_date = None
+        edges = []
+        for key, (width, height) in zip(URL_KEYS, _DIM_KEYS):
+            url = get(key) or None
+            setattr(photo, key, url)
+            edges.append(max(int(get(width) or 0), int(get(height) or 0))
+                         if url else 0)
+        photo.edges = tuple(edges)
+        return photo
+
+    def sizes(self):
+        """Listed sizes as [(url_key, url, longest edge or 0)], largest first."""
+        edges = self.edges or (0,) * len(URL_KEYS)
+        return [(key, getattr(self, key), edge)
+                for key, edge in zip(URL_KEYS, edges) if getattr(self, key)]
+
+    @property
+    def author(self):
+        """The owner's display name, or their NSID if it was not listed."""
+        return self.owner_name or self.owner
+
+    def get(self, key, default=None):
+        slot = _RESPONSE_KEYS.get(key)
+        if slot is None:
+            return default
+        value = getattr(self, slot)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        slot = _RESPONSE_KEYS.get(key)
+        if slot is None or getattr(self, slot) is None:
+            raise KeyError(key)
+        return getattr(self, slot)
+
+    def __contains__(self, key):
+        slot = _RESPONSE_KEYS.get(key)
+        return slot is not None and getattr(self, slot) is not None
+
+    def __repr__(self):
+        return f"Photo(id={self.id!r}, title={self.title!r})"
+
+
+def _content(value):
+    """Unwrap flickrapi's {"_content": ...} objects into plain strings."""
+    if isinstance(value, dict):
+        value = value.get("_content", "")
+    return value or ""
@@ -0,0 +1,231 @@
+"""Columnar view of fetched photos for filtering and sorting before download."""
+
+from array import array
+
+# NumPy evaluates each predicate over a whole column at once; without it
+# the columns are stdlib arrays and predicates narrow a row list in turn.
+_HAS_NUMPY = False
+try:
+    import numpy as np
+    _HAS_NUMPY = True
+except ImportError:
+    pass
+
+# Numeric columns and their array typecodes
+_COLUMNS = {
+    "date_taken": "q",
+    "date_upload": "q",
+    "license": "b",
+    "o_width": "l",
+    "o_height": "l",
+    "owner": "l",
+}
+
+
+class PhotoTable:
+    """Photos from the fetch methods laid out as one array per field.
+
+    Build one from a list (or stream) of Photo records, then narrow it
+    with filter() and order it with sort(); both return a new table that
+    shares the columns, so chaining is cheap. Iterating yields the Photo
+    records of the remaining rows in order::
+
+        table = PhotoTable(dl.fetch_interestingness(day, 500))
+        wide = table.filter(min_width=3000, licenses=["4", "9", "10"])
+        dl.download_photos(wide.sort("date_taken").photos(), folder)
+
+    Dates compare as YYYYMMDDhhmmss integers, so '2024-05' and
+    '2024-05-01 18:30' are both valid bounds.
+    """
+
+    def __init__(self, photos=()):
+        self._photos = list(photos)
+        owners = {}
+        values = {name: [] for name in _COLUMNS}
+        for photo in self._photos:
+            values["date_taken"].append(_date_key(photo.date_taken))
+            values["date_upload"].append(photo.date_upload)
+            values["license"].append(
+                int(photo.license) if photo.license.isdigit() else -1)
+            values["o_width"].append(photo.o_width)
+            values["o_height"].append(photo.o_height)
+            values["owner"].append(
+                owners.setdefault(photo.owner, len(owners)))
+        self._columns = {name: _column(values[name], typecode)
+                         for name, typecode in _COLUMNS.items()}
+        self._owners = owners
+        self._tags = None
+        self._rows = _column(range(len(self._photos)), "l")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        photos = self._photos
+        return (photos[row] for row in self._rows)
+
+    def photos(self):
+        """Return the remaining Photo records as a list."""
+        return list(self)
+
+    def filter(self, owner=None, min_width=0, min_height=0,
+               taken_after=None, taken_before=None, uploaded_after=None,
+               uploaded_before=None, licenses=None, tags=None,
+               tag_mode="any"):
+        """Return a table of the rows matching every given condition.
+
+        Args:
+            owner: Owner NSID.
+            min_width: Minimum original width in pixels.
+            min_height: Minimum original height in pixels. Photos whose
+                original size was not listed (request the 'o_dims' extra)
+                are kept by both dimension filters.
+            taken_after: Earliest date taken, 'YYYY-MM-DD[ hh:mm:ss]'.
+            taken_before: Latest date taken, inclusive.
+            uploaded_after: Earliest upload time as a Unix timestamp.
+            uploaded_before: Latest upload time, inclusive.
+            licenses: Iterable of accepted Flickr license ids.
+            tags: Iterable of tags; see tag_mode.
+            tag_mode: 'any' to keep photos with at least one of the tags,
+                'all' for photos with every one.
+
+        Returns:
+            A new PhotoTable.
+        """
+        tests = []
+        if owner is not None:
+            tests.append(("owner", "eq", self._owners.get(owner, -1)))
+        if min_width:
+            tests.append(("o_width", "min", int(min_width)))
+        if min_height:
+            tests.append(("o_height", "min", int(min_height)))
+        if taken_after or taken_before:
+            tests.append(("date_taken", "between", (
+                _date_key(taken_after) if taken_after else 1,
+                _date_key(taken_before, end=True) if taken_before
+                else 99999999999999)))
+        if uploaded_after or uploaded_before:
+            tests.append(("date_upload", "between", (
+                int(uploaded_after or 1), int(uploaded_before or 2 ** 62))))
+        if licenses is not None:
+            tests.append(("license", "in", {int(lic) for lic in licenses}))
+
+        rows = self._select(tests)
+        if tags:
+            rows = self._with_tags(rows, tags, tag_mode)
+        return self._view(rows)
+
+    def sort(self, column, reverse=False):
+        """Return a table ordered by a column, stable for equal values.
+
+        Args:
+            column: 'date_taken', 'date_upload', 'license', 'o_width',
+                'o_height' or 'pixels' (original width x height).
+            reverse: True for largest/newest first.
+        """
+        if column == "pixels":
+            width, height = self._columns["o_width"], self._columns["o_height"]
+            if _HAS_NUMPY:
+                values = width.astype(np.int64) * height
+            else:
+                values = [w * h for w, h in zip(width, height)]
+        else:
+            values = self._columns[column]
+
+        rows = self._rows
+        if _HAS_NUMPY:
+            keys = values[rows]
+            if reverse:
+                # Stable descending order: sort the negated keys
+                keys = -keys
+            return self._view(rows[np.argsort(keys, kind="stable")])
+        ordered = sorted(rows, key=values.__getitem__, reverse=reverse)
+        return self._view(_column(ordered, "l"))
+
+    def _select(self, tests):
+        """Rows of this table passing every (column, kind, value) test."""
+        rows = self._rows
+        if not tests:
+            return rows
+        if _HAS_NUMPY:
+            mask = np.ones(len(self._photos), dtype=bool)
+            for name, kind, value in tests:
+                mask &= _mask(self._columns[name], kind, value)
+            return rows[mask[rows]]
+        for name, kind, value in tests:
+            column = self._columns[name]
+            test = _predicate(kind, value)
+            rows = [row for row in rows if test(column[row])]
+        return _column(rows, "l")
+
+    def _with_tags(self, rows, tags, tag_mode):
+        if self._tags is None:
+            # Inverted index, built the first time tags are filtered on
+            self._tags = {}
+            for row, photo in enumerate(self._photos):
+                for tag in photo.tags:
+                    self._tags.setdefault(tag.lower(), set()).add(row)
+        sets = [self._tags.get(tag.lower(), set()) for tag in tags]
+        if tag_mode == "all":
+            matching = set.intersection(*sets)
+        else:
+            matching = set.union(*sets)
+        if _HAS_NUMPY:
+            mask = np.zeros(len(self._photos), dtype=bool)
+            mask[list(matching)] = True
+            return rows[mask[rows]]
+        return _column([row for row in rows if row in matching], "l")
+
+    def _view(self, rows):
+        table = PhotoTable.__new__(PhotoTable)
+        table._photos = self._photos
+        table._columns = self._columns
+        table._owners = self._owners
+        table._tags = self._tags
+        table._rows = rows
+        return table
+
+
+def _column(values, typecode):
+    if _HAS_NUMPY:
+        return np.array(values, dtype=np.dtype(typecode))
+    return array(typecode, values)
+
+
+def _mask(column, kind, value):
+    """Boolean NumPy mask of a column for one test."""
+    if kind == "eq":
+        return column == value
+    if kind == "min":
+        return (column >= value) | (column == 0)
+    if kind == "between":
+        low, high = value
+        return (column >= low) & (column <= high)
+    return np.isin(column, list(value))
+
+
+def _predicate(kind, value):
+    """Scalar counterpart of _mask."""
+    if kind == "eq":
+        return lambda v: v == value
+    if kind == "min":
+        return lambda v: v >= value or v == 0
+    if kind == "between":
+        low, high = value
+        return lambda v: low <= v <= high
+    return value.__contains__
+
+
+def _date_key(text, end=False):
+    """'2024-05-01 18:30:00', or any prefix of it, as 20240501183000.
+
+    A prefix stands for its first second, or its last with ``end``. Dates
+    Flickr does not know ('' or all zeros) give 0.
+    """
+    digits = (text or "").replace("-", "").replace(" ", "").replace(":", "")
+    digits = digits[:14]
+    if not digits.strip("0"):
+        return 0
+    if end:
+        return int(digits.ljust(14, "9"))
+    return int(digits.ljust(14, "0"))
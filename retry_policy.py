@@ -0,0 +1,189 @@
+"""Retry policy shared by Flickr API calls and photo downloads."""
+
+import asyncio
+import random
+import re
+import threading
+import time
+
+import requests
+from flickrapi.exceptions import FlickrError
+
+# The async engine's transport errors are only known when aiohttp is there
+_HAS_AIOHTTP = False
+try:
+    import aiohttp
+    _HAS_AIOHTTP = True
+except ImportError:
+    pass
+
+# HTTP statuses worth retrying; 429 also slows the shared RateLimiter
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Flickr API error codes for outages rather than bad requests
+_TRANSIENT_API_CODES = frozenset({105, 106})
+# flickrapi reports HTTP errors from the REST endpoint only in the message
+_STATUS_MESSAGE = re.compile(r"Status code (\d+)")
+
+_TRANSIENT_ERRORS = (
+    requests.ConnectionError, requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    ConnectionError, TimeoutError, asyncio.TimeoutError,
+)
+if _HAS_AIOHTTP:
+    _TRANSIENT_ERRORS += (aiohttp.ClientConnectionError,
+                          aiohttp.ClientPayloadError)
+
+
+def classify(error=None, status=None):
+    """Say whether a failed request is worth retrying.
+
+    Args:
+        error: The exception raised, if any.
+        status: The HTTP status of the response, if there was one.
+
+    Returns:
+        'throttle' for rate limiting (HTTP 429), 'transient' for server
+        errors, dropped connections, timeouts and Flickr outages, or None
+        for failures a retry will not fix.
+    """
+    if status is None and error is not None:
+        # requests' HTTPError carries the response, aiohttp's the status
+        response = getattr(error, "response", None)
+        status = (getattr(response, "status_code", None)
+                  or getattr(error, "status", None))
+        if status is None and isinstance(error, FlickrError):
+            match = _STATUS_MESSAGE.search(str(error))
+            if match:
+                status = int(match.group(1))
+    if status is not None and status != 200:
+        if status == 429:
+            return "throttle"
+        return "transient" if status in RETRY_STATUSES else None
+    if error is None:
+        return None
+    if isinstance(error, FlickrError):
+        code = getattr(error, "code", None)
+        return "transient" if _api_code(code) in _TRANSIENT_API_CODES else None
+    if isinstance(error, _TRANSIENT_ERRORS):
+        return "transient"
+    return None
+
+
+class RetryPolicy:
+    """Which failures are retried, how long to wait, and when to give up.
+
+    Waits grow exponentially from ``base_delay`` up to ``max_delay`` with
+    full jitter (a random wait between zero and the exponential step), so
+    requests that failed together do not all retry together; a
+    Retry-After from the server is used as given. A request is abandoned
+    after ``max_attempts`` tries, or when the next wait would take it past
+    ``max_elapsed`` seconds since its first try.
+
+    On top of that every job has a retry budget: ``budget`` retries, plus
+    ``budget_ratio`` more for every request that succeeded. During a
+    Flickr incident a job therefore stops retrying soon after most of its
+    requests start failing, instead of multiplying the load.
+
+    A policy holds no state, so one instance can serve every job; each
+    job counts its retries in its own RetryTracker.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=30.0,
+                 max_elapsed=120.0, budget=20, budget_ratio=0.2,
+                 jitter=True):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        self.budget = budget
+        self.budget_ratio = budget_ratio
+        self.jitter = jitter
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait after the given failed attempt (0-based)."""
+        if retry_after is not None:
+            return retry_after
+        step = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return random.uniform(0, step) if self.jitter else step
+
+
+class RetryTracker:
+    """Retry counters and budget for one job under a RetryPolicy.
+
+    Safe to use from every worker thread of the job.
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy or RetryPolicy()
+        self._lock = threading.Lock()
+        self._successes = 0
+        self._counts = {
+            "throttled": 0,
+            "transient": 0,
+            "retried": 0,
+            "gave_up": 0,
+            "budget_exhausted": 0,
+        }
+        self._waited = 0.0
+
+    def success(self):
+        """Record a request that succeeded, earning retry budget."""
+        with self._lock:
+            self._successes += 1
+
+    def backoff(self, error=None, status=None, attempt=0, started=None,
+                retry_after=None):
+        """Decide whether and when to retry a failed request.
+
+        Args:
+            error: The exception raised, if any.
+            status: The HTTP status of the response, if there was one.
+            attempt: How many earlier tries of this request failed.
+            started: time.monotonic() of the request's first try.
+            retry_after: Seconds the server asked to wait, if it said.
+
+        Returns:
+            Tuple of (kind, wait): kind as from classify(), and the
+            seconds to wait before retrying, or None to give up.
+        """
+        policy = self.policy
+        kind = classify(error, status)
+        if kind is None:
+            return None, None
+        wait = policy.delay(attempt, retry_after)
+        with self._lock:
+            self._counts["throttled" if kind == "throttle" else kind] += 1
+            if attempt + 1 >= policy.max_attempts or (
+                    started is not None and policy.max_elapsed is not None
+                    and time.monotonic() - started + wait
+                    > policy.max_elapsed):
+                self._counts["gave_up"] += 1
+                return kind, None
+            if policy.budget is not None and self._counts["retried"] >= (
+                    policy.budget + policy.budget_ratio * self._successes):
+                self._counts["gave_up"] += 1
+                self._counts["budget_exhausted"] += 1
+                return kind, None
+            self._counts["retried"] += 1
+            self._waited += wait
+        return kind, wait
+
+    def stats(self):
+        """Return the job's retry counters.
+
+        Returns:
+            Dict with 'throttled' and 'transient' (retryable failures
+            seen), 'retried', 'gave_up', 'budget_exhausted' (give-ups for
+            lack of budget), and 'waited' (seconds of backoff).
+        """
+        with self._lock:
+            result = dict(self._counts)
+            result["waited"] = round(self._waited, 1)
+        return result
+
+
+def _api_code(code):
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
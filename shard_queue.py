@@ -0,0 +1,103 @@
+"""Resumable work queue for sharded Flickr searches."""
+
+import json
+import sqlite3
+import threading
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query (
+    id    INTEGER PRIMARY KEY CHECK (id = 1),
+    query TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shards (
+    region   TEXT PRIMARY KEY,
+    expected INTEGER NOT NULL,
+    done     INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS seen (
+    photo_id TEXT PRIMARY KEY
+)
+"""
+
+
+class ShardQueue:
+    """Remembers a sharded search's plan and which shards are finished.
+
+    A search interrupted part way (cancelled, crashed, rate limited out)
+    and started again with the same state file skips the planning calls
+    and every finished shard, and still drops photos that a finished
+    shard already produced. Starting a different query with the same file
+    discards the old state, and so does clear() once a search has finished.
+    """
+
+    def __init__(self, path, query):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        key = json.dumps(query, sort_keys=True)
+        row = self._conn.execute("SELECT query FROM query").fetchone()
+        if row is None or row[0] != key:
+            self._reset()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query (id, query) VALUES (1, ?)",
+                (key,))
+        self._conn.commit()
+
+    def clear(self):
+        """Forget the plan and finished shards, keeping the query."""
+        with self._lock:
+            self._reset()
+            self._conn.commit()
+
+    def _reset(self):
+        self._conn.execute("DELETE FROM shards")
+        self._conn.execute("DELETE FROM seen")
+
+    def planned(self):
+        """Return the saved plan as [(region, expected)], or None."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT region, expected FROM shards").fetchall()
+        if not rows:
+            return None
+        return [(tuple(json.loads(region)), expected)
+                for region, expected in rows]
+
+    def set_plan(self, shards):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO shards (region, expected) VALUES (?, ?)",
+                [(json.dumps(list(region)), expected)
+                 for region, expected in shards])
+            self._conn.commit()
+
+    def pending(self):
+        """Shards not finished yet, as [(region, expected)]."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT region, expected FROM shards WHERE done = 0").fetchall()
+        return [(tuple(json.loads(region)), expected)
+                for region, expected in rows]
+
+    def seen_ids(self):
+        """Ids of photos produced by finished shards."""
+        with self._lock:
+            return {row[0] for row in
+                    self._conn.execute("SELECT photo_id FROM seen")}
+
+    def mark_done(self, region, photo_ids):
+        """Record a finished shard and the photos it produced."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen (photo_id) VALUES (?)",
+                [(str(pid),) for pid in photo_ids])
+            self._conn.execute(
+                "UPDATE shards SET done = 1 WHERE region = ?",
+                (json.dumps(list(region)),))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -177,6 +177,7 @@ function gatherParams() {
     if (tab === 'interestingness') {
         params.tab_type = 'interestingness';
         params.date = document.getElementById('int-date').value.trim();
+        params.end_date = document.getElementById('int-end-date').value.trim();
         params.count = parseInt(document.getElementById('int-count').value) || 500;
         if (userNsid) params.user_id = userNsid;
     } else if (tab === 'search') {
@@ -15,13 +15,14 @@ from flask import (
     session, flash, jsonify, Response, send_file, stream_with_context,
 )
 from dotenv import load_dotenv
-import requests as http_requests
 
 # Ensure core module is importable
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 load_dotenv()
 
+import flickr_client
 import flickr_downloader as core
+import http_pool
 from web_auth import (
     check_password, check_totp, is_totp_configured,
     generate_totp_secret, generate_totp_qr,
@@ -198,6 +199,23 @@ def debug_page():
         checks.append("markupsafe: OK")
     except Exception as e:
         checks.append(f"markupsafe: FAIL — {e}")
+    for key, client in sorted(flickr_client.stats().items()):
+        checks.append(
+            f"API client {key}: {client['calls']} calls "
+            f"({client['errors']} failed, avg {client['avg_ms']:.0f} ms), "
+            f"{client['in_flight']} in flight (peak "
+            f"{client['peak_in_flight']}), {client['connections']} "
+            f"connections, {client['reused']} reused")
+    for host, counts in sorted(http_pool.stats().items()):
+        checks.append(
+            f"HTTP pool {host}: {counts['requests']} requests over "
+            f"{counts['connections']} connections "
+            f"({counts['reused']} reused)")
+    cache = download_manager.api_cache.stats()
+    checks.append(
+        f"API cache: {cache['hits']} hits, {cache['misses']} misses, "
+        f"{cache['entries']} entries ({cache['bytes']} bytes), "
+        f"{cache['evictions']} evicted")
     html = "<h2>Debug Info</h2><pre>" + "\n".join(checks) + "</pre>"
     return html
 
@@ -364,7 +382,13 @@ def api_search():
         return jsonify(error="Flickr API credentials not configured."), 500
 
     try:
-        dl = core.FlickrDownloader(api_key, api_secret)
+        dl = core.FlickrDownloader(
+            api_key, api_secret,
+            rate_limiter=download_manager.rate_limiter,
+            cache=download_manager.api_cache,
+            retry_policy=download_manager.retry_policy)
+        # The preview only shows thumbnails, owners and dates
+        dl.extras = "url_sq,owner_name,date_taken"
         photos = dl.search_photos(
             text=data.get("text", ""),
             tags=data.get("tags", ""),
@@ -373,19 +397,17 @@ def api_search():
             license_ids=data.get("license_ids", ""),
             count=min(int(data.get("count", 100)), 500),
             user_id=data.get("user_id", ""),
+            use_cache=not data.get("refresh"),
         )
         total = len(photos)
         preview = []
         for p in photos[:50]:
-            title = p.get("title", "")
-            if isinstance(title, dict):
-                title = title.get("_content", "")
             preview.append({
-                "id": p.get("id", ""),
-                "title": title,
-                "owner": p.get("ownername", "") or p.get("owner", ""),
-                "date_taken": p.get("datetaken", ""),
-                "thumb_url": p.get("url_sq", ""),
+                "id": p.id,
+                "title": p.title,
+                "owner": p.author,
+                "date_taken": p.date_taken,
+                "thumb_url": p.url_sq or "",
             })
         return jsonify(total=total, preview=preview)
     except Exception as e:
@@ -401,10 +423,15 @@ def api_interestingness():
         return jsonify(error="Flickr API credentials not configured."), 500
 
     try:
-        dl = core.FlickrDownloader(api_key, api_secret)
+        dl = core.FlickrDownloader(
+            api_key, api_secret,
+            rate_limiter=download_manager.rate_limiter,
+            cache=download_manager.api_cache,
+            retry_policy=download_manager.retry_policy)
         date_str = data.get("date", "")
         count = min(int(data.get("count", 500)), 500)
-        photos = dl.fetch_interestingness(date_str, count)
+        photos = dl.fetch_interestingness(
+            date_str, count, use_cache=not data.get("refresh"))
         return jsonify(total=len(photos))
     except Exception as e:
         return jsonify(error=str(e)), 500
@@ -423,9 +450,14 @@ def api_resolve_user():
         return jsonify(error="Username is required.")
 
     try:
-        dl = core.FlickrDownloader(api_key, api_secret)
-        nsid, uname = dl.resolve_user(username)
-        albums = dl.fetch_user_albums(nsid)
+        dl = core.FlickrDownloader(
+            api_key, api_secret,
+            rate_limiter=download_manager.rate_limiter,
+            cache=download_manager.api_cache,
+            retry_policy=download_manager.retry_policy)
+        use_cache = not data.get("refresh")
+        nsid, uname = dl.resolve_user(username, use_cache=use_cache)
+        albums = dl.fetch_user_albums(nsid, use_cache=use_cache)
         album_list = [{"id": a["id"], "title": a["title"],
                        "photos": a["photos"]} for a in albums]
         return jsonify(nsid=nsid, username=uname, albums=album_list)
@@ -441,11 +473,9 @@ def proxy_thumb():
     if not url or "staticflickr.com" not in url:
         return "", 400
     try:
-        resp = http_requests.get(url, timeout=10)
-        return Response(
-            resp.content,
-            mimetype=resp.headers.get("Content-Type", "image/jpeg"),
-        )
+        content, content_type = core.fetch_thumbnail(
+            url, download_manager.rate_limiter)
+        return Response(content, mimetype=content_type or "image/jpeg")
     except Exception:
         return "", 502
 
@@ -476,6 +506,9 @@ def api_download_start():
     if tab_type == "interestingness":
         params["date"] = data.get("date", "")
         params["count"] = min(int(data.get("count", 500)), 500)
+        end_date = data.get("end_date", "").strip()
+        if end_date and end_date != params["date"]:
+            params["end_date"] = end_date
         if data.get("user_id"):
             params["user_id"] = data["user_id"]
 
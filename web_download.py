@@ -1,5 +1,6 @@
 """Download manager: background jobs, zip creation, SSE progress, cleanup."""
 
+import asyncio
 import os
 import shutil
 import tempfile
@@ -13,6 +14,8 @@ from queue import Queue
 from typing import Optional
 
 import flickr_downloader as core
+from api_cache import ApiCache
+from flickr_async import AsyncFlickrDownloader
 
 
 class JobStatus(Enum):
@@ -39,12 +42,28 @@ class DownloadJob:
 
 
 class DownloadManager:
-    """Manages download jobs with background threads."""
+    """Manages download jobs with background threads.
 
-    def __init__(self, max_concurrent: int = 2):
+    With ``engine="async"`` (or DOWNLOAD_ENGINE=async in the environment)
+    every job runs as a task on one shared event loop thread instead of
+    getting a thread of its own.
+    """
+
+    def __init__(self, max_concurrent: int = 2,
+                 engine: Optional[str] = None):
         self._jobs: dict[str, DownloadJob] = {}
         self._lock = threading.Lock()
         self._max_concurrent = max_concurrent
+        self._engine = engine or os.environ.get("DOWNLOAD_ENGINE", "thread")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # One request budget shared by every job and API route
+        self.rate_limiter = core.RateLimiter()
+        # Retry rules for every job; each job keeps its own retry budget
+        self.retry_policy = core.RetryPolicy()
+        # API responses cached across jobs (API_CACHE_DIR overrides the path)
+        self.api_cache = ApiCache(os.environ.get("API_CACHE_DIR") or
+                                  os.path.join(tempfile.gettempdir(),
+                                               "flickr_api_cache"))
         cleanup = threading.Thread(target=self._cleanup_loop, daemon=True)
         cleanup.start()
 
@@ -68,6 +87,14 @@ class DownloadManager:
                     "Too many concurrent downloads. Please wait.")
             self._jobs[job_id] = job
 
+        if self._engine == "async":
+            asyncio.run_coroutine_threadsafe(
+                self._run_job_async(
+                    job, api_key, api_secret, tab_type, params),
+                self._event_loop(),
+            )
+            return job_id
+
         thread = threading.Thread(
             target=self._run_job,
             args=(job, api_key, api_secret, tab_type, params),
@@ -76,6 +103,15 @@ class DownloadManager:
         thread.start()
         return job_id
 
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the shared event loop thread on first use."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, daemon=True).start()
+            return self._loop
+
     def get_job(self, job_id: str) -> Optional[DownloadJob]:
         return self._jobs.get(job_id)
 
@@ -102,77 +138,58 @@ class DownloadManager:
         job.temp_dir = temp_dir
 
         try:
-            dl = core.FlickrDownloader(api_key, api_secret)
-            job.downloader = dl
-            job.status = JobStatus.RUNNING
-
-            def progress_cb(current, total):
-                job.downloaded_count = current
-                job.photo_count = total
-                job.progress_queue.put({
-                    "type": "progress",
-                    "current": current,
-                    "total": total,
-                })
-
-            def log_cb(msg):
-                job.progress_queue.put({"type": "log", "message": msg})
-
-            dl.set_callbacks(progress_cb=progress_cb, log_cb=log_cb)
+            dl = core.FlickrDownloader(
+                api_key, api_secret, rate_limiter=self.rate_limiter,
+                cache=self.api_cache, retry_policy=self.retry_policy)
+            log_cb = self._attach_downloader(job, dl)
+            self._limit_extras(dl, params)
 
             # Fetch photos
             photos = self._fetch_photos(dl, tab_type, params, log_cb)
-
-            if dl.is_cancelled:
-                job.status = JobStatus.CANCELLED
-                job.progress_queue.put({"type": "cancelled"})
-                return
-
-            if not photos:
-                job.status = JobStatus.COMPLETE
-                job.progress_queue.put({
-                    "type": "complete",
-                    "message": "No photos found.",
-                    "file_ready": False,
-                })
+            if self._finished_early(job, dl, photos):
                 return
 
             # Download to temp dir
-            downloaded, skipped, failed = dl.download_photos(
-                photos, temp_dir,
-                size_key=params.get("size_key", "url_l"),
-                embed_metadata=params.get("embed_metadata", True),
-                filename_template=params.get(
-                    "filename_template", "{title}_{id}"),
-            )
+            result = dl.download_photos(
+                photos, temp_dir, **self._download_options(params))
+            self._complete_job(job, dl, temp_dir, result)
 
-            if dl.is_cancelled:
-                job.status = JobStatus.CANCELLED
-                job.progress_queue.put({"type": "cancelled"})
-                return
+        except core.CancelledError:
+            job.status = JobStatus.CANCELLED
+            job.progress_queue.put({"type": "cancelled"})
+        except Exception as e:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+            job.progress_queue.put({"type": "error", "message": str(e)})
+        finally:
+            try:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            except Exception:
+                pass
 
-            # Zip
-            job.status = JobStatus.ZIPPING
-            job.progress_queue.put({"type": "zipping"})
+    async def _run_job_async(self, job: DownloadJob, api_key: str,
+                             api_secret: str, tab_type: str,
+                             params: dict) -> None:
+        """Same steps as _run_job, driven by the shared event loop."""
+        temp_dir = tempfile.mkdtemp(prefix="flickr_dl_")
+        job.temp_dir = temp_dir
 
-            zip_path = os.path.join(
-                tempfile.gettempdir(), f"flickr_{job.job_id}.zip")
-            with zipfile.ZipFile(zip_path, "w",
-                                 zipfile.ZIP_DEFLATED) as zf:
-                for fname in os.listdir(temp_dir):
-                    fpath = os.path.join(temp_dir, fname)
-                    if os.path.isfile(fpath):
-                        zf.write(fpath, fname)
+        try:
+            dl = AsyncFlickrDownloader(
+                api_key, api_secret, rate_limiter=self.rate_limiter,
+                cache=self.api_cache, retry_policy=self.retry_policy)
+            log_cb = self._attach_downloader(job, dl)
+            self._limit_extras(dl, params)
+
+            photos = await asyncio.to_thread(
+                self._fetch_photos, dl, tab_type, params, log_cb)
+            if self._finished_early(job, dl, photos):
+                return
 
-            job.zip_path = zip_path
-            job.status = JobStatus.COMPLETE
-            job.progress_queue.put({
-                "type": "complete",
-                "message": (f"Downloaded {downloaded}, "
-                            f"skipped {skipped}, failed {failed}."),
-                "file_ready": True,
-                "job_id": job.job_id,
-            })
+            result = await dl.download_photos_async(
+                photos, temp_dir, **self._download_options(params))
+            await asyncio.to_thread(
+                self._complete_job, job, dl, temp_dir, result)
 
         except core.CancelledError:
             job.status = JobStatus.CANCELLED
@@ -187,20 +204,152 @@ class DownloadManager:
             except Exception:
                 pass
 
+    @staticmethod
+    def _attach_downloader(job: DownloadJob, dl):
+        """Wire a downloader's callbacks to the job's progress queue.
+
+        Returns the log callback so fetch steps can report through it.
+        """
+        job.downloader = dl
+        job.status = JobStatus.RUNNING
+
+        def progress_cb(current, total):
+            job.downloaded_count = current
+            job.photo_count = total
+            job.progress_queue.put({
+                "type": "progress",
+                "current": current,
+                "total": total,
+            })
+
+        def log_cb(msg):
+            job.progress_queue.put({"type": "log", "message": msg})
+
+        dl.set_callbacks(progress_cb=progress_cb, log_cb=log_cb)
+        return log_cb
+
+    @staticmethod
+    def _finished_early(job: DownloadJob, dl, photos) -> bool:
+        """Close out a job that was cancelled or found nothing to download."""
+        if dl.is_cancelled:
+            job.status = JobStatus.CANCELLED
+            job.progress_queue.put({"type": "cancelled"})
+            return True
+
+        if not photos:
+            job.status = JobStatus.COMPLETE
+            job.progress_queue.put({
+                "type": "complete",
+                "message": "No photos found.",
+                "file_ready": False,
+            })
+            return True
+        return False
+
+    @classmethod
+    def _limit_extras(cls, dl, params: dict) -> None:
+        """Only list the sizes and fields this job's download will use."""
+        options = cls._download_options(params)
+        dl.limit_extras(options["size_key"], options["embed_metadata"],
+                        options["filename_template"])
+
+    @staticmethod
+    def _download_options(params: dict) -> dict:
+        return {
+            "size_key": params.get("size_key", "url_l"),
+            "embed_metadata": params.get("embed_metadata", True),
+            "filename_template": params.get(
+                "filename_template", "{title}_{id}"),
+            # Each job downloads into a fresh temp dir
+            "use_manifest": False,
+            # A range of Explore days is filed in a folder per day
+            "group_by": "explore_date" if params.get("end_date") else None,
+        }
+
+    @staticmethod
+    def _complete_job(job: DownloadJob, dl, temp_dir: str,
+                      result: tuple) -> None:
+        """Zip the downloaded files and report the totals."""
+        downloaded, skipped, failed = result
+
+        if dl.is_cancelled:
+            job.status = JobStatus.CANCELLED
+            job.progress_queue.put({"type": "cancelled"})
+            return
+
+        if not any(result):
+            # A streamed listing turned out to be empty
+            job.status = JobStatus.COMPLETE
+            job.progress_queue.put({
+                "type": "complete",
+                "message": "No photos found.",
+                "file_ready": False,
+            })
+            return
+
+        # Zip
+        job.status = JobStatus.ZIPPING
+        job.progress_queue.put({"type": "zipping"})
+
+        zip_path = os.path.join(
+            tempfile.gettempdir(), f"flickr_{job.job_id}.zip")
+        with zipfile.ZipFile(zip_path, "w",
+                             zipfile.ZIP_DEFLATED) as zf:
+            for root, _dirs, files in os.walk(temp_dir):
+                for fname in files:
+                    # Leftover .part files belong to failed transfers
+                    if core.is_part_file(fname):
+                        continue
+                    fpath = os.path.join(root, fname)
+                    zf.write(fpath, os.path.relpath(fpath, temp_dir))
+
+        job.zip_path = zip_path
+        message = (f"Downloaded {downloaded}, "
+                   f"skipped {skipped}, failed {failed}")
+        if dl.metadata_failures:
+            message += f", {dl.metadata_failures} without metadata"
+        retries = dl.retries.stats()
+        if retries["retried"] or retries["gave_up"]:
+            message += (f", {retries['retried']} retries, "
+                        f"{retries['gave_up']} given up")
+        deferred = dl.retry_summary
+        if deferred["deferred"]:
+            message += (f", {deferred['recovered']} of "
+                        f"{deferred['deferred']} deferred recovered")
+        job.status = JobStatus.COMPLETE
+        job.progress_queue.put({
+            "type": "complete",
+            "message": message + ".",
+            "file_ready": True,
+            "job_id": job.job_id,
+            "retries": retries,
+            "deferred": deferred,
+        })
+
     @staticmethod
     def _fetch_photos(dl, tab_type, params, log_cb):
         """Call the appropriate core fetch method."""
+        if tab_type == "interestingness" and params.get("end_date"):
+            stream = dl.iter_interestingness_range(
+                params["date"], params["end_date"], params["count"])
+            if params.get("user_id"):
+                nsid = params["user_id"]
+                return (p for p in stream if p.owner == nsid)
+            return stream
+
         if tab_type == "interestingness":
             photos = dl.fetch_interestingness(
                 params["date"], params["count"])
             if params.get("user_id"):
                 nsid = params["user_id"]
-                photos = [p for p in photos if p.get("owner") == nsid]
+                photos = core.PhotoTable(photos).filter(owner=nsid).photos()
                 log_cb(f"Filtered to {len(photos)} photos by user.")
             return photos
 
+        # The remaining sources are streamed so downloading starts while
+        # later pages are still being listed.
         if tab_type == "search":
-            return dl.search_photos(
+            return dl.iter_search_photos(
                 text=params.get("text", ""),
                 tags=params.get("tags", ""),
                 tag_mode=params.get("tag_mode", "any"),
@@ -211,12 +360,12 @@ class DownloadManager:
             )
 
         if tab_type == "user_photostream":
-            return dl.fetch_user_photos(
+            return dl.iter_user_photos(
                 params["user_nsid"], params["count"])
 
         if tab_type == "album":
             log_cb(f"Downloading album: {params.get('album_title', '')}")
-            return dl.fetch_album_photos(
+            return dl.iter_album_photos(
                 params["user_nsid"], params["album_id"])
 
         return []